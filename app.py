@@ -1,303 +1,1109 @@
-from flask import Flask, request, jsonify, send_from_directory
-import random
+import time
+_MODULE_START = time.perf_counter()
+
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context, g
+from werkzeug.exceptions import RequestEntityTooLarge
 import os
-from collections import Counter
-import re
-import statistics
 import math
-import sympy
-from sympy.parsing.sympy_parser import parse_expr, standard_transformations, implicit_multiplication_application
+from collections import namedtuple
+from functools import lru_cache
+import re
+import threading
+import queue
+import atexit
+import multiprocessing
+import signal
+import stat
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import argparse
+import logging
+import logging.handlers
+import sys
+import csv
+import io
+import json
+import hashlib
+import sqlite3
+from array import array
+
+import metrics
+import result_cache
+import sessions
+import stats_engine
+from markov import CompactMarkovModel
 
 app = Flask(__name__)
 
-class SimpleMarkovModel:
-    def __init__(self):
-        self.model = {}
-
-    def train(self, text):
-        words = text.lower().split()
-        for i in range(len(words) - 1):
-            if words[i] not in self.model:
-                self.model[words[i]] = {}
-            if words[i + 1] not in self.model[words[i]]:
-                self.model[words[i]][words[i + 1]] = 0
-            self.model[words[i]][words[i + 1]] += 1
-
-    def generate(self, start_word, length=20):
-        if start_word not in self.model:
-            return "I don't know how to respond to that."
-        
-        result = [start_word]
-        for _ in range(length - 1):
-            if result[-1] not in self.model:
-                break
-            next_word_options = list(self.model[result[-1]].keys())
-            next_word_weights = list(self.model[result[-1]].values())
-            next_word = random.choices(next_word_options, weights=next_word_weights)[0]
-            result.append(next_word)
-        
-        return ' '.join(result)
+# Leveled logging through a queue: the request path only enqueues records and a
+# listener thread writes them to stderr, so a slow stderr never blocks a
+# request but nothing is held back either. Set SADHAK_LOG_LEVEL=OFF to silence
+# it entirely.
+logger = logging.getLogger('sadhak')
+_log_listener = None
+
+def _start_log_listener(handler, stream):
+    # A fresh queue each time: a forked child must not write out the
+    # records its parent still had queued.
+    global _log_listener
+    handler.queue = queue.SimpleQueue()
+    _log_listener = logging.handlers.QueueListener(handler.queue, stream)
+    _log_listener.start()
 
-# Initialize and train the model
-model = SimpleMarkovModel()
-model.train("""
+def _stop_log_listener():
+    if _log_listener is not None:
+        _log_listener.stop()
+
+def configure_logging():
+    level = os.environ.get('SADHAK_LOG_LEVEL', 'INFO').upper()
+    if level == 'OFF':
+        logger.disabled = True
+        return
+    logger.setLevel(getattr(logging, level, logging.INFO))
+    if logger.handlers:
+        return
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    logger.addHandler(handler)
+    logger.propagate = False
+    _start_log_listener(handler, stream)
+    # Drain the queue on a normal exit, and give forked workers a listener of
+    # their own: the parent's thread doesn't exist in the child.
+    atexit.register(_stop_log_listener)
+    os.register_at_fork(after_in_child=lambda: _start_log_listener(handler, stream))
+
+configure_logging()
+
+# Import/first-request timings, tracked so cold-start cost can be compared
+# across releases. Served at /startup.
+STARTUP_TIMINGS = {
+    'import_seconds': None,
+    'sympy_import_seconds': None,
+    'warmup_seconds': None,
+    'first_request_seconds': None,
+}
+
+# Batch requests are spread over a pool of worker processes so large batches use
+# every core instead of a single GIL-bound request thread.
+BATCH_WORKERS = int(os.environ.get('SADHAK_BATCH_WORKERS', os.cpu_count() or 1))
+BATCH_CHUNK_SIZE = int(os.environ.get('SADHAK_BATCH_CHUNK_SIZE', 16))
+BATCH_MAX_PROMPTS = int(os.environ.get('SADHAK_BATCH_MAX_PROMPTS', 10000))
+
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
+
+# The served model is the compact one; a pre-trained model file can be
+# memory-mapped via SADHAK_MARKOV_MODEL so workers start without retraining.
+MARKOV_MODEL_PATH = os.environ.get('SADHAK_MARKOV_MODEL')
+MARKOV_SEED_TEXT = """
 Sadhak Calculator is a versatile tool for mathematical and statistical calculations.
 It can perform basic arithmetic operations like addition, subtraction, multiplication, and division.
 The calculator also handles more complex tasks such as calculating mean, median, and mode.
 For statistical analysis, users can input data into a table to compute various measures.
 Sadhak Calculator aims to be user-friendly and efficient for both simple and advanced calculations.
-""")
+"""
+
+def load_markov_model():
+    if MARKOV_MODEL_PATH and os.path.exists(MARKOV_MODEL_PATH):
+        return CompactMarkovModel.load(MARKOV_MODEL_PATH)
+    markov_model = CompactMarkovModel()
+    markov_model.train(MARKOV_SEED_TEXT)
+    return markov_model
+
+model = load_markov_model()
+
+NUMBER_PATTERN = r'-?\d+(?:\.\d+)?'
 
 def extract_numbers(text):
-    return [float(match) for match in re.findall(r'-?\d+(?:\.\d+)?', text)]
+    return [float(match) for match in re.findall(NUMBER_PATTERN, text)]
+
+GREETING_WORDS = ['hi', 'hello', 'hey', 'greetings', 'good morning', 'good afternoon', 'good evening']
+COMPLIMENT_WORDS = ['thanks', 'thank you', 'appreciate', 'grateful', 'good job', 'well done', 'awesome']
+
+# Query intents in precedence order: when a prompt mentions several, the first
+# one listed wins (so "median" beats "mode", "mode" beats "mean", and so on).
+INTENT_KEYWORDS = [
+    ('median', ['median']),
+    ('mode', ['mode', 'most', 'common', 'frequent']),
+    ('mean', ['mean', 'average']),
+    ('sum', ['sum', 'total', 'add']),
+    ('subtract', ['subtract', 'difference']),
+    ('multiply', ['multiply', 'product']),
+    ('divide', ['divide', 'quotient']),
+    ('expression', ['calculate', 'evaluate', 'simplify', 'expression']),
+]
+
+PromptAnalysis = namedtuple('PromptAnalysis', ['greeting', 'compliment', 'intent', 'numbers'])
+
+_NUMBER_RE = re.compile(NUMBER_PATTERN)
+_DIGITS = '0123456789'
+
+def _mentions(text, words):
+    for word in words:
+        if word in text:
+            return True
+    return False
+
+def analyze_prompt(prompt):
+    # One lowercase copy serves every keyword check. Each check is a plain
+    # substring search, which CPython runs as a C-level scan; on long prompts
+    # that beats any single combined regex. The number regex only runs when
+    # the prompt has a digit at all, which is again a substring check.
+    lowered = prompt.lower()
+    intent = 'unknown'
+    for candidate, words in INTENT_KEYWORDS:
+        if _mentions(lowered, words):
+            intent = candidate
+            break
+    numbers = []
+    for digit in _DIGITS:
+        if digit in prompt:
+            numbers = list(map(float, _NUMBER_RE.findall(prompt)))
+            break
+    return PromptAnalysis(_mentions(lowered, GREETING_WORDS), _mentions(lowered, COMPLIMENT_WORDS), intent, numbers)
 
 def is_greeting(text):
-    greeting_words = ['hi', 'hello', 'hey', 'greetings', 'good morning', 'good afternoon', 'good evening']
-    return any(word in text.lower() for word in greeting_words)
+    return analyze_prompt(text).greeting
 
 def is_compliment(text):
-    compliment_words = ['thanks', 'thank you', 'appreciate', 'grateful', 'good job', 'well done', 'awesome']
-    return any(word in text.lower() for word in compliment_words)
+    return analyze_prompt(text).compliment
 
 def interpret_query(prompt):
-    prompt = prompt.lower()
-    if 'median' in prompt:
-        return 'median'
-    elif any(word in prompt for word in ['mode', 'most', 'common', 'frequent']):
-        return 'mode'
-    elif any(word in prompt for word in ['mean', 'average']):
-        return 'mean'
-    elif any(word in prompt for word in ['sum', 'total', 'add']):
-        return 'sum'
-    elif any(word in prompt for word in ['subtract', 'difference']):
-        return 'subtract'
-    elif any(word in prompt for word in ['multiply', 'product']):
-        return 'multiply'
-    elif any(word in prompt for word in ['divide', 'quotient']):
-        return 'divide'
-    elif any(word in prompt for word in ['calculate', 'evaluate', 'simplify', 'expression']):
-        return 'expression'
-    else:
-        return 'unknown'
+    return analyze_prompt(prompt).intent
+
+# Symbolic evaluation runs in a pool of warm worker processes so a pathological
+# "simplify ..." prompt can't hold a request thread indefinitely. Each worker
+# first sends a cheap cancel/expand result and then the full simplify; if the
+# deadline passes first, the worker is killed and replaced and the cheap result
+# (when there is one) is returned instead.
+SYMPY_WORKERS = int(os.environ.get('SADHAK_SYMPY_WORKERS', 2))
+SYMPY_DEADLINE = float(os.environ.get('SADHAK_SYMPY_DEADLINE', 5.0))
+
+# SymPy is only needed for 'expression' queries, so it is imported on first use
+# rather than at module load. warm_up() does the import ahead of time in the
+# master process so forked workers share the loaded pages copy-on-write.
+sympy = None
+parse_expr = standard_transformations = implicit_multiplication_application = None
+_sympy_lock = threading.Lock()
+
+def _load_sympy():
+    global sympy, parse_expr, standard_transformations, implicit_multiplication_application
+    if sympy is not None:
+        return
+    with _sympy_lock:
+        if sympy is not None:
+            return
+        start = time.perf_counter()
+        import sympy as sympy_module
+        from sympy.parsing import sympy_parser
+        parse_expr = sympy_parser.parse_expr
+        standard_transformations = sympy_parser.standard_transformations
+        implicit_multiplication_application = sympy_parser.implicit_multiplication_application
+        sympy = sympy_module
+        STARTUP_TIMINGS['sympy_import_seconds'] = time.perf_counter() - start
+
+def warm_up(start_pool=False):
+    # Only a process that serves requests itself should start the SymPy pool:
+    # forked server workers start their own, so a pool in a pre-fork master
+    # would just hold idle processes.
+    start = time.perf_counter()
+    _load_sympy()
+    # Prime the parser and simplify caches before any worker is forked.
+    expr = _parse_symbolic('(x**2+2*x+1)/(x+1)')
+    _cheap_simplify(expr)
+    sympy.simplify(expr)
+    # NumPy too, so workers don't each import it on their first value table.
+    stats_engine.load_numpy()
+    if start_pool and SYMPY_WORKERS > 0:
+        get_sympy_pool()
+    STARTUP_TIMINGS['warmup_seconds'] = time.perf_counter() - start
+
+def _parse_symbolic(expression):
+    _load_sympy()
+    x, y, z = sympy.symbols('x y z')
+    transformations = (standard_transformations + (implicit_multiplication_application,))
+    return parse_expr(expression, transformations=transformations)
+
+def _cheap_simplify(expr):
+    _load_sympy()
+    try:
+        return sympy.cancel(expr)
+    except Exception:
+        return sympy.expand(expr)
+
+PARENT_POLL_SECONDS = 1.0
+
+def _close_inherited_sockets(keep=()):
+    try:
+        fds = [int(name) for name in os.listdir('/proc/self/fd')]
+    except OSError:
+        fds = range(3, min(os.sysconf('SC_OPEN_MAX'), 65536))
+    for fd in fds:
+        if fd in keep:
+            continue
+        try:
+            if stat.S_ISSOCK(os.fstat(fd).st_mode):
+                os.close(fd)
+        except OSError:
+            pass
+
+def _exit_with_parent(parent_pid):
+    while os.getppid() == parent_pid:
+        time.sleep(PARENT_POLL_SECONDS)
+    os._exit(0)
+
+def detach_from_server(keep=()):
+    # Forked workers inherit the server's signal handlers and every socket it
+    # had open: the listening socket, client connections and the SymPy
+    # workers' pipes (socketpairs). Drop them so the port is released with the
+    # server and the pipes see EOF, and exit as soon as the server is gone,
+    # even in the middle of a long evaluation.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _close_inherited_sockets(set(keep))
+    threading.Thread(target=_exit_with_parent, args=(os.getppid(),), daemon=True).start()
+
+def _simplify_task(conn, expression):
+    start = time.perf_counter()
+    expr = _parse_symbolic(expression)
+    parsed = time.perf_counter()
+    cheap = str(_cheap_simplify(expr))
+    conn.send(('partial', cheap, {'sympy_parse': parsed - start, 'sympy_cheap': time.perf_counter() - parsed}))
+    start = time.perf_counter()
+    result = str(sympy.simplify(expr))
+    conn.send(('done', result, {'sympy_simplify': time.perf_counter() - start}))
+
+def _arithmetic(expression):
+    return str(eval(expression))
+
+def _arithmetic_task(conn, expression):
+    start = time.perf_counter()
+    result = _arithmetic(expression)
+    conn.send(('done', result, {'arithmetic': time.perf_counter() - start}))
+
+def _table_task(conn, payload):
+    expression, bindings = payload
+    start = time.perf_counter()
+    compile_expression(_normalize_expression(expression))
+    compiled = time.perf_counter()
+    summary = summarize_table(evaluate_bindings(expression, bindings))
+    conn.send(('done', summary, {'sympy_compile': compiled - start, 'vector_evaluate': time.perf_counter() - compiled}))
+
+_WORKER_TASKS = {
+    'simplify': _simplify_task,
+    'arithmetic': _arithmetic_task,
+    'table': _table_task,
+}
+
+def _sympy_worker_main(conn):
+    detach_from_server(keep=(conn.fileno(),))
+    _load_sympy()
+    while True:
+        try:
+            task, payload = conn.recv()
+        except EOFError:
+            break
+        try:
+            _WORKER_TASKS[task](conn, payload)
+        except Exception as e:
+            conn.send(('error', str(e), {}))
+
+class SympyTimeout(Exception):
+    pass
+
+# Set while generating a response whose text depends on timing (a deadline
+# fallback or timeout), so the result cache doesn't keep it.
+_response_state = threading.local()
+
+def _mark_uncacheable():
+    _response_state.uncacheable = True
+
+SYMPY_TIMEOUTS = metrics.Counter('sadhak_sympy_timeouts_total',
+                                 'SymPy evaluations that hit the deadline, by whether a cheap result was returned.',
+                                 ('fallback',))
+
+def _record_sympy_timings(timings):
+    # Worker-side timings; recorded directly since they ran in parallel with
+    # the request thread, which already times its wait as 'sympy_evaluate'.
+    for stage, seconds in timings.items():
+        metrics.STAGE_SECONDS.observe(seconds, stage, 'expression')
+
+class SympyWorkerPool:
+    def __init__(self, size, deadline):
+        self.size = size
+        self.deadline = deadline
+        self.pid = os.getpid()
+        self._ctx = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(target=_sympy_worker_main, args=(child_conn,), daemon=True)
+        process.start()
+        child_conn.close()
+        return process, parent_conn
+
+    def _replace(self, worker):
+        process, conn = worker
+        process.kill()
+        process.join()
+        conn.close()
+        self._idle.put(self._spawn())
+
+    def simplify(self, expression, deadline=None):
+        return self.run('simplify', expression, deadline)
+
+    def arithmetic(self, expression, deadline=None):
+        return self.run('arithmetic', expression, deadline)
+
+    def run(self, task, payload, deadline=None):
+        deadline = self.deadline if deadline is None else deadline
+        expires = time.monotonic() + deadline
+        try:
+            worker = self._idle.get(timeout=deadline)
+        except queue.Empty:
+            _mark_uncacheable()
+            raise SympyTimeout(f"no evaluation worker became free within {deadline:g} seconds")
+
+        process, conn = worker
+        partial = None
+        try:
+            conn.send((task, payload))
+            while True:
+                remaining = expires - time.monotonic()
+                if remaining <= 0 or not conn.poll(remaining):
+                    break
+                kind, value, timings = conn.recv()
+                _record_sympy_timings(timings)
+                if kind == 'partial':
+                    partial = value
+                    continue
+                self._idle.put(worker)
+                if kind == 'error':
+                    raise ValueError(value)
+                return value
+        except (EOFError, OSError, BrokenPipeError):
+            pass
+
+        # Deadline passed (or the worker died): kill it and bring up a fresh one
+        # so the next request doesn't queue behind a stuck simplify.
+        self._replace(worker)
+        _mark_uncacheable()
+        SYMPY_TIMEOUTS.inc('partial' if partial is not None else 'none')
+        if partial is not None:
+            return partial
+        raise SympyTimeout(f"evaluation timed out after {deadline:g} seconds")
+
+_sympy_pool = None
+_sympy_pool_lock = threading.Lock()
+
+def get_sympy_pool():
+    global _sympy_pool
+    with _sympy_pool_lock:
+        # A pool inherited through fork belongs to the parent; start our own.
+        if _sympy_pool is None or _sympy_pool.pid != os.getpid():
+            _sympy_pool = SympyWorkerPool(SYMPY_WORKERS, SYMPY_DEADLINE)
+        return _sympy_pool
+
+def simplify_symbolic(expression):
+    if SYMPY_WORKERS <= 0:
+        with metrics.timer('sympy_parse', 'expression'):
+            expr = _parse_symbolic(expression)
+        with metrics.timer('sympy_simplify', 'expression'):
+            return str(sympy.simplify(expr))
+    return get_sympy_pool().simplify(expression)
+
+def _normalize_expression(expression):
+    expression = expression.strip().rstrip(',').replace('^', '**')
+    return re.sub(r'\s+', '', expression)
+
+def _evaluate(expression):
+    # Plain arithmetic goes through the workers too: eval("9**9**9") can run
+    # for minutes just like a pathological simplify.
+    expression = _normalize_expression(expression)
+    if re.search(r'[a-zA-Z]', expression):
+        return simplify_symbolic(expression)
+    if SYMPY_WORKERS <= 0:
+        return _arithmetic(expression)
+    return get_sympy_pool().arithmetic(expression)
 
 def evaluate_expression(expression):
     try:
-        expression = expression.strip().rstrip(',').replace('^', '**')
-        expression = re.sub(r'\s+', '', expression)
-        
-        if re.search(r'[a-zA-Z]', expression):
-            x, y, z = sympy.symbols('x y z')
-            transformations = (standard_transformations + (implicit_multiplication_application,))
-            expr = parse_expr(expression, transformations=transformations)
-            result = sympy.simplify(expr)
-            return str(result)
-        else:
-            return str(eval(expression))
+        return _evaluate(expression)
     except Exception as e:
         return f"Error evaluating expression: {str(e)}"
 
-def generate_response(prompt, max_length=20):
-    print(f"Received prompt: {prompt}")  # Debug print
+# Prompts that bind values ("when x=3", "for x = 1, 2, 3", "for x from 0 to 1e6
+# step 1", or several variables at once for a grid) are evaluated numerically:
+# the expression is parsed once, compiled with lambdify into a NumPy function
+# and applied to every point in a single array operation. Parsing can take as
+# long as simplifying (x*9^9^9), so with SymPy workers the whole evaluation
+# runs in a worker under the deadline, and only the rendered rows and summary
+# come back. Compiled functions are cached by normalized expression, in each
+# worker, so repeated table requests skip parsing.
+EXPRESSION_MAX_POINTS = int(os.environ.get('SADHAK_EXPRESSION_MAX_POINTS', 2_000_000))
+EXPRESSION_CACHE_SIZE = int(os.environ.get('SADHAK_EXPRESSION_CACHE_SIZE', 256))
+
+BINDING_VARIABLES = ('x', 'y', 'z')
+_BINDING_CLAUSE = re.compile(r'\s+(?i:when|where|for|with|at)\s+(?=[xyz](?:\s*=|\s+(?i:from|in)\b))')
+_BINDING_START = re.compile(r'\b([xyz])(?:\s*=|\s+(?i:from|in)\b)\s*')
+_BINDING_NUMBER = r'-?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?'
+_BINDING_RANGE = re.compile(rf'({_BINDING_NUMBER})\s*(?:to|\.\.)\s*({_BINDING_NUMBER})'
+                            rf'(?:\s*(?:step|by)\s*({_BINDING_NUMBER}))?', re.IGNORECASE)
+
+BindingRange = namedtuple('BindingRange', ['start', 'stop', 'step', 'count'])
+ExpressionTable = namedtuple('ExpressionTable', ['variables', 'axes', 'values'])
+# The rendered parts of an ExpressionTable: its formatted value when it has a
+# single point, otherwise its rows and (min, max, mean) of the finite values.
+TableSummary = namedtuple('TableSummary', ['variables', 'size', 'value', 'rows', 'extremes'])
+
+def split_bindings(text):
+    """Split "2x^2 + 3x - 5 when x=3" into the expression and its binding text."""
+    clause = _BINDING_CLAUSE.search(text)
+    if clause is None:
+        return text, ''
+    return text[:clause.start()], text[clause.end():]
+
+def _parse_binding_values(variable, spec):
+    found = _BINDING_RANGE.search(spec)
+    if found:
+        start, stop = float(found.group(1)), float(found.group(2))
+        step = float(found.group(3)) if found.group(3) else 1.0
+        if step == 0 or (stop - start) / step < 0:
+            raise ValueError(f"the range for {variable} from {start:g} to {stop:g} never ends with step {step:g}")
+        return BindingRange(start, stop, step, math.floor((stop - start) / step + 1e-9) + 1)
+    values = [float(value) for value in re.findall(_BINDING_NUMBER, spec)]
+    if not values:
+        raise ValueError(f"no values given for {variable}")
+    return values
+
+def parse_bindings(text):
+    starts = list(_BINDING_START.finditer(text))
+    bindings = {}
+    for start, following in zip(starts, starts[1:] + [None]):
+        spec = text[start.end():following.start() if following else len(text)]
+        bindings[start.group(1)] = _parse_binding_values(start.group(1), spec)
+    return bindings
+
+def _binding_size(binding):
+    return binding.count if isinstance(binding, BindingRange) else len(binding)
+
+def _binding_array(binding):
+    np = stats_engine.load_numpy()
+    if isinstance(binding, BindingRange):
+        return binding.start + binding.step * np.arange(binding.count, dtype=np.float64)
+    return np.asarray(binding, dtype=np.float64)
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def compile_expression(expression):
+    """Parse a normalized expression and lambdify it; returns (variables, function)."""
+    expr = _parse_symbolic(expression)
+    # lambdify can't print zoo (complex infinity) or nan, so "x/0" would fail
+    # with a bare 'ComplexInfinity'.
+    if expr.has(sympy.zoo, sympy.nan):
+        raise ValueError("the expression is undefined for every value (it divides by zero)")
+    variables = tuple(sorted(str(symbol) for symbol in expr.free_symbols))
+    return variables, sympy.lambdify([sympy.Symbol(name) for name in variables], expr, 'numpy')
+
+def evaluate_bindings(expression, bindings):
+    np = stats_engine.load_numpy()
+    with metrics.timer('sympy_compile', 'expression'):
+        variables, function = compile_expression(_normalize_expression(expression))
+    missing = [name for name in variables if name not in bindings]
+    if missing:
+        raise ValueError(f"no value given for {', '.join(missing)}")
+
+    # Each bound variable is one axis of the grid, in x, y, z order. Sparse
+    # axes broadcast against each other, so only the result is full size.
+    names = [name for name in BINDING_VARIABLES if name in bindings]
+    shape = tuple(_binding_size(bindings[name]) for name in names)
+    points = math.prod(shape)
+    if points > EXPRESSION_MAX_POINTS:
+        raise ValueError(f"{points:,} points requested; the limit is {EXPRESSION_MAX_POINTS:,}")
+    axes = [_binding_array(bindings[name]) for name in names]
+    grid = dict(zip(names, np.meshgrid(*axes, indexing='ij', sparse=True)))
+
+    with metrics.timer('vector_evaluate', 'expression'), np.errstate(all='ignore'):
+        values = np.broadcast_to(np.asarray(function(*(grid[name] for name in variables))), shape)
+    return ExpressionTable(names, axes, values)
+
+def _format_point(value):
+    value = value.item() if hasattr(value, 'item') else value
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return str(value)
+
+def summarize_table(table):
+    np = stats_engine.load_numpy()
+    values = table.values
+    if values.size == 1:
+        return TableSummary(table.variables, 1, _format_point(values.reshape(-1)[0]), None, None)
+    extremes = None
+    if np.isrealobj(values) and np.isfinite(values).any():
+        finite = values[np.isfinite(values)]
+        extremes = tuple(_format_point(value) for value in (finite.min(), finite.max(), finite.mean()))
+    return TableSummary(table.variables, values.size, None, _format_table_rows(table), extremes)
+
+def tabulate_bindings(expression, bindings):
+    """Evaluate a bound expression at every point; returns a TableSummary."""
+    if SYMPY_WORKERS <= 0:
+        return summarize_table(evaluate_bindings(expression, bindings))
+    with metrics.timer('sympy_evaluate', 'expression'):
+        return get_sympy_pool().run('table', (expression, bindings))
+
+def _describe_binding(name, binding):
+    if isinstance(binding, BindingRange):
+        return f"{name} from {_format_point(binding.start)} to {_format_point(binding.stop)} step {_format_point(binding.step)}"
+    return f"{name} = {stats_engine.format_values([_format_point(v) for v in binding], ', ')}"
+
+def _format_table_rows(table):
+    np = stats_engine.load_numpy()
+    n = table.values.size
+    if n <= stats_engine.RENDER_LIMIT:
+        rows = range(n)
+    else:
+        rows = [*range(stats_engine.PREVIEW_SIZE), None, *range(n - stats_engine.PREVIEW_SIZE, n)]
+    lines = []
+    for row in rows:
+        if row is None:
+            lines.append(f"… ({n - 2 * stats_engine.PREVIEW_SIZE:,} points omitted)\n")
+            continue
+        index = np.unravel_index(row, table.values.shape)
+        point = ', '.join(f"{name} = {_format_point(axis[i])}" for name, axis, i in zip(table.variables, table.axes, index))
+        lines.append(f"{point} → {_format_point(table.values[index])}\n")
+    return ''.join(lines)
+
+def _expression_timeout_message():
+    return f"That expression is taking too long to evaluate: I stopped working on it after {SYMPY_DEADLINE:g} seconds. Very large powers such as 9^9^9, or expressions with many nested terms, can take far longer than that. Could you try a smaller or simpler version, or split it into parts?"
+
+def _expression_error_message(result):
+    return f"I apologize, but I encountered an error while evaluating the expression: {result}\n\nCould you please check the expression and try again? Make sure all operations are clearly stated and parentheses are properly balanced. If you're not sure how to format the expression, feel free to ask for examples."
 
-    if is_greeting(prompt):
-        return "Hello! I'm Sadhak Calculator, your AI math assistant. How can I help you with calculations today?"
+def _iter_bound_expression(expression, bindings, summary):
+    described = '; '.join(_describe_binding(name, bindings[name]) for name in summary.variables)
+    steps = ("Mathematical Solution\n"
+             "Step-by-step Evaluation:\n\n"
+             f"1. Start with the original expression: {expression.strip()}\n"
+             f"2. Substitute the given values: {described}\n")
+    if summary.size == 1:
+        yield steps + f"3. Evaluate: {summary.value}\n\n"
+    else:
+        yield steps + f"3. Evaluate all {summary.size:,} points at once:\n\n"
+        yield summary.rows + "\n"
+        if summary.extremes is not None:
+            low, high, mean = summary.extremes
+            yield (f"Across these points the result ranges from {low} to {high}, "
+                   f"with a mean of {mean}.\n\n")
+    yield ("Concept Summary\n"
+           "Substituting values into an expression turns it into a function you can tabulate or plot. Evaluating it at many points shows how the result changes as the variables change, which is the first step towards graphing a function or finding where it reaches its largest and smallest values.")
+
+def _response_intent(analysis):
+    return 'greeting' if analysis.greeting else 'compliment' if analysis.compliment else analysis.intent
+
+def analyze_prompt_timed(prompt):
+    start = time.perf_counter()
+    analysis = analyze_prompt(prompt)
+    # Intent detection and number extraction are a single scan, timed together.
+    metrics.observe('analyze', _response_intent(analysis), time.perf_counter() - start)
+    return analysis
+
+def iter_response(prompt, analysis=None, stream=False):
+    # Yields the explanation section by section, so streaming clients can show
+    # the opening text while the computation for later steps is still running.
+    # stream=True is for clients that display sections as they arrive; see
+    # _iter_expression for the one place the text differs.
+    logger.debug("Received prompt: %s", prompt)
+    if analysis is None:
+        analysis = analyze_prompt_timed(prompt)
+    yield from metrics.track_sections(_iter_sections(prompt, analysis, stream), _response_intent(analysis))
+
+def _iter_sections(prompt, analysis, stream=False):
+    if analysis.greeting:
+        yield "Hello! I'm Sadhak Calculator, your AI math assistant. How can I help you with calculations today?"
+        return
     
-    if is_compliment(prompt):
-        return "Thank you! I'm glad I could help. Math can be challenging, but it's also fascinating. Is there anything else you'd like to explore?"
+    if analysis.compliment:
+        yield "Thank you! I'm glad I could help. Math can be challenging, but it's also fascinating. Is there anything else you'd like to explore?"
+        return
     
-    numbers = extract_numbers(prompt)
-    query_type = interpret_query(prompt)
+    numbers = analysis.numbers
+    query_type = analysis.intent
+
+    if query_type == 'expression':
+        yield from _iter_expression(prompt, stream)
+    elif query_type in STATISTICS_OPERATIONS:
+        yield from iter_operation(query_type, numbers)
+    else:
+        yield "I'm not quite sure how to interpret your query. Could you please rephrase it or specify the type of calculation you want to perform? For example, you could ask about calculating the mean, median, mode, or perform basic arithmetic operations like addition, subtraction, multiplication, or division. I'm here to help with a wide range of mathematical calculations!"
 
+def _expression_text(prompt):
+    expression_match = re.search(r'(calculate|evaluate|simplify)\s*(.*)', prompt, re.IGNORECASE)
+    return expression_match.group(2) if expression_match else prompt
+
+def _iter_expression(prompt, stream=False):
+    expression = _expression_text(prompt)
+    bound_expression, binding_text = split_bindings(expression)
+    opening = ("Evaluating the Expression\n\n"
+               "Initial Explanation\n"
+               f"We'll evaluate the expression: {expression}. To solve this, we'll apply mathematical rules and operations in the correct order. This may involve simplifying fractions, combining like terms, or solving for variables.\n\n")
+    
+    # A streaming client gets the opening text while the evaluation runs, so a
+    # failure follows it. Otherwise evaluate first: a failure is then the whole
+    # response, as it was before streaming.
+    if stream:
+        yield opening
+    
+    failure = None
     try:
-        if query_type == 'mean':
-            if not numbers:
-                return "I'd be happy to help you calculate the mean, but I couldn't find any numbers in your query. Could you please provide some numerical data? For example, you could ask 'What's the mean of 5, 7, 10, 12, and 15?'"
-            
-            sum_numbers = sum(numbers)
-            count = len(numbers)
-            mean = sum_numbers / count
-            
-            response = "Calculating the Mean\n\n"
-            response += "Initial Explanation\n"
-            response += "To calculate the mean (or average) of a set of numbers, you need to find the central value that represents the dataset. This involves adding up all the numbers and then dividing by the total number of values. The mean provides a measure of central tendency and is useful for understanding the overall distribution of the data.\n\n"
-            response += "Mathematical Solution\n"
-            response += "Sum the Numbers:\n\n"
-            response += "Start by adding all the numbers together:\n\n"
-            response += f"{' + '.join(map(str, numbers))} = {sum_numbers}\n\n"
-            response += "Count the Numbers:\n\n"
-            response += "Determine how many numbers are in the dataset:\n\n"
-            response += f"n = {count}\n\n"
-            response += "Calculate the Mean:\n\n"
-            response += "Divide the sum by the count of numbers:\n\n"
-            response += f"Mean = Sum / Count = {sum_numbers} / {count} = {mean:.1f}\n\n"
-            response += "Concept Summary\n"
-            response += "The mean is a measure of central tendency that gives you an average value from a set of numbers. By summing all values and dividing by the number of values, you obtain a single number that represents the center of the dataset. It's a fundamental concept in statistics used to understand the overall distribution and central value of numerical data."
-            
-            return response
-
-        elif query_type == 'mode':
-            if not numbers:
-                return "I'd be happy to help you find the mode, but I couldn't find any numbers in your query. Could you please provide some numerical data? For example, you could ask 'What's the mode of 1, 2, 2, 3, 3, 3, 4?'"
-            
-            counts = Counter(numbers)
-            max_count = max(counts.values())
-            modes = [k for k, v in counts.items() if v == max_count]
-            
-            response = "Finding the Mode\n\n"
-            response += "Initial Explanation\n"
-            response += "The mode is the value (or values) that appear most frequently in a dataset. It's particularly useful for understanding the most common or typical value, especially in datasets with discrete values.\n\n"
-            response += "Mathematical Solution\n"
-            response += "Count the Occurrences:\n\n"
-            for num, count in counts.items():
-                response += f"{num} appears {count} time{'s' if count > 1 else ''}\n"
-            response += f"\nIdentify the Highest Frequency: {max_count}\n\n"
-            response += "Determine the Mode(s):\n\n"
-            if len(modes) == 1:
-                response += f"The mode is {modes[0]}, appearing {max_count} time{'s' if max_count > 1 else ''}.\n\n"
-            else:
-                response += f"There are multiple modes: {', '.join(map(str, modes))}, each appearing {max_count} times.\n\n"
-            response += "Concept Summary\n"
-            response += "The mode is particularly useful when you want to find the most common value in a dataset. It's the only measure of central tendency that can be used with nominal data (categories) as well as numerical data. In some cases, a dataset may have no mode, one mode, or multiple modes, providing insights into the distribution and frequency of values in the data."
-            
-            return response
+        if binding_text:
+            bindings = parse_bindings(binding_text)
+            summary = tabulate_bindings(bound_expression, bindings)
+        else:
+            with metrics.timer('sympy_evaluate', 'expression'):
+                result = _evaluate(expression)
+    except SympyTimeout:
+        failure = _expression_timeout_message()
+    except Exception as e:
+        failure = _expression_error_message(f"Error evaluating expression: {str(e)}")
+    if failure is not None:
+        if stream:
+            # The cache must hold the text a non-streaming request would get.
+            _mark_uncacheable()
+        yield failure
+        return
+    
+    if not stream:
+        yield opening
+    if binding_text:
+        yield from _iter_bound_expression(bound_expression, bindings, summary)
+        return
+    
+    yield ("Mathematical Solution\n"
+           "Step-by-step Evaluation:\n\n"
+           f"1. Start with the original expression: {expression}\n"
+           f"2. Apply mathematical rules and simplify: {result}\n\n")
+    yield ("Concept Summary\n"
+           "This process of simplification and evaluation is crucial in algebra and calculus. It allows us to reduce complex expressions to their simplest form, making it easier to understand the relationships between variables or to find specific values.")
+
+STATISTICS_OPERATIONS = ('mean', 'mode', 'median', 'sum', 'subtract', 'multiply', 'divide')
+
+def iter_operation(query_type, numbers):
+    if query_type == 'mean':
+        if len(numbers) == 0:
+            yield "I'd be happy to help you calculate the mean, but I couldn't find any numbers in your query. Could you please provide some numerical data? For example, you could ask 'What's the mean of 5, 7, 10, 12, and 15?'"
+            return
+        
+        yield ("Calculating the Mean\n\n"
+               "Initial Explanation\n"
+               "To calculate the mean (or average) of a set of numbers, you need to find the central value that represents the dataset. This involves adding up all the numbers and then dividing by the total number of values. The mean provides a measure of central tendency and is useful for understanding the overall distribution of the data.\n\n")
+        
+        with metrics.timer('compute', query_type):
+            sum_numbers = stats_engine.total(numbers)
+        count = len(numbers)
+        mean = sum_numbers / count
+        
+        yield ("Mathematical Solution\n"
+               "Sum the Numbers:\n\n"
+               "Start by adding all the numbers together:\n\n"
+               f"{stats_engine.format_values(numbers, ' + ')} = {sum_numbers}\n\n")
+        yield ("Count the Numbers:\n\n"
+               "Determine how many numbers are in the dataset:\n\n"
+               f"n = {count}\n\n")
+        yield ("Calculate the Mean:\n\n"
+               "Divide the sum by the count of numbers:\n\n"
+               f"Mean = Sum / Count = {sum_numbers} / {count} = {mean:.1f}\n\n")
+        yield ("Concept Summary\n"
+               "The mean is a measure of central tendency that gives you an average value from a set of numbers. By summing all values and dividing by the number of values, you obtain a single number that represents the center of the dataset. It's a fundamental concept in statistics used to understand the overall distribution and central value of numerical data.")
 
+    elif query_type == 'mode':
+        if len(numbers) == 0:
+            yield "I'd be happy to help you find the mode, but I couldn't find any numbers in your query. Could you please provide some numerical data? For example, you could ask 'What's the mode of 1, 2, 2, 3, 3, 3, 4?'"
+            return
+        
+        yield ("Finding the Mode\n\n"
+               "Initial Explanation\n"
+               "The mode is the value (or values) that appear most frequently in a dataset. It's particularly useful for understanding the most common or typical value, especially in datasets with discrete values.\n\n")
+        
+        with metrics.timer('compute', query_type):
+            counts, max_count, modes = stats_engine.mode(numbers)
+        
+        yield ("Mathematical Solution\n"
+               "Count the Occurrences:\n\n"
+               + stats_engine.format_counts(counts))
+        step = f"\nIdentify the Highest Frequency: {max_count}\n\n"
+        step += "Determine the Mode(s):\n\n"
+        if len(modes) == 1:
+            step += f"The mode is {modes[0]}, appearing {max_count} time{'s' if max_count > 1 else ''}.\n\n"
+        else:
+            step += f"There are multiple modes: {stats_engine.format_values(modes, ', ')}, each appearing {max_count} times.\n\n"
+        yield step
+        yield ("Concept Summary\n"
+               "The mode is particularly useful when you want to find the most common value in a dataset. It's the only measure of central tendency that can be used with nominal data (categories) as well as numerical data. In some cases, a dataset may have no mode, one mode, or multiple modes, providing insights into the distribution and frequency of values in the data.")
+
+    elif query_type == 'median':
+        if len(numbers) == 0:
+            yield "I'd be happy to help you find the median, but I couldn't find any numbers in your query. Could you please provide some numerical data? For example, you could ask 'What's the median of 10, 15, 20, 25, and 30?'"
+            return
+        
+        yield ("Finding the Median\n\n"
+               "Initial Explanation\n"
+               "The median is the middle value in a sorted dataset. It's a robust measure of central tendency, less affected by extreme values or outliers compared to the mean.\n\n")
+        
+        n = len(numbers)
+        
+        yield ("Mathematical Solution\n"
+               "Sort the Numbers:\n\n"
+               f"First, we arrange the numbers in ascending order: {stats_engine.format_sorted(numbers)}\n\n")
+        
+        with metrics.timer('compute', query_type):
+            median, lower_middle, upper_middle = stats_engine.median(numbers)
+        
+        step = "Find the Middle Value:\n\n"
+        if n % 2 == 0:
+            step += f"Since we have an even number of values ({n}), we take the average of the two middle numbers.\n"
+            step += f"The two middle numbers are {lower_middle} and {upper_middle}.\n"
+            step += f"Median = ({lower_middle} + {upper_middle}) / 2 = {median}\n\n"
+        else:
+            step += f"Since we have an odd number of values ({n}), we take the middle number.\n"
+            step += f"The middle number is {median}.\n\n"
+        yield step
+        yield ("Concept Summary\n"
+               "The median is particularly useful when dealing with skewed distributions or when you want to find the 'middle' value in a dataset. It's less sensitive to extreme values compared to the mean, making it a good choice for datasets with outliers.")
+
+    elif query_type == 'sum':
+        if len(numbers) == 0:
+            yield "I'd be happy to help you calculate the sum, but I couldn't find any numbers in your query. Could you please provide some numerical data? For example, you could ask 'What's the sum of 5, 10, 15, 20, and 25?'"
+            return
+        
+        yield ("Calculating the Sum\n\n"
+               "Initial Explanation\n"
+               "The sum is the total obtained by adding all the numbers together. It's a fundamental operation in mathematics used in various calculations and analyses.\n\n")
+        
+        with metrics.timer('compute', query_type):
+            total = stats_engine.total(numbers)
+        
+        yield ("Mathematical Solution\n"
+               "Add All Numbers:\n\n"
+               f"{stats_engine.format_values(numbers, ' + ')} = {total}\n\n")
+        yield ("Concept Summary\n"
+               "The sum is useful in many contexts, such as calculating totals in financial statements, finding the total distance traveled in physics problems, or as a step in calculating averages.")
+
+    elif query_type == 'subtract':
+        if len(numbers) < 2:
+            yield "I'd be happy to help you with subtraction, but I need at least two numbers to perform this operation. Could you please provide more numerical data? For example, you could ask 'What's the result of subtracting 15 and 7 from 100?'"
+            return
+        
+        yield ("Performing Subtraction\n\n"
+               "Initial Explanation\n"
+               "In subtraction, we start with the first number and subtract all subsequent numbers from it.\n\n")
+        
+        with metrics.timer('compute', query_type):
+            result = numbers[0] - stats_engine.total(numbers[1:])
+        
+        yield ("Mathematical Solution\n"
+               "Step-by-step Process:\n\n"
+               f"1. Start with the first number: {numbers[0]}\n")
+        yield f"2. Subtract the following numbers: {stats_engine.format_values(numbers[1:], ' - ')}\n"
+        yield f"3. Perform the calculation: {numbers[0]} - ({stats_engine.format_values(numbers[1:], ' + ')}) = {result}\n\n"
+        yield ("Concept Summary\n"
+               "Subtraction is a fundamental operation in mathematics, used to find the difference between values. It's essential in various real-world scenarios, from financial calculations to scientific measurements.")
+
+    elif query_type == 'multiply':
+        if len(numbers) == 0:
+            yield "I'd be happy to help you with multiplication, but I couldn't find any numbers in your query. Could you please provide some numerical data? For example, you could ask 'What's the product of 2, 3, 4, and 5?'"
+            return
+        
+        yield ("Performing Multiplication\n\n"
+               "Initial Explanation\n"
+               "Multiplication is the process of adding a number to itself a specified number of times. When multiplying multiple numbers, we find the product of all the numbers.\n\n")
+        
+        with metrics.timer('compute', query_type):
+            product = stats_engine.product(numbers)
+        
+        yield ("Mathematical Solution\n"
+               "Multiply All Numbers:\n\n"
+               f"{stats_engine.format_values(numbers, ' × ')} = {product}\n\n")
+        yield ("Concept Summary\n"
+               "Multiplication is a fundamental operation in mathematics, often thought of as repeated addition. It's used in various fields, from calculating areas and volumes to more complex applications in physics and engineering.")
+
+    elif query_type == 'divide':
+        if len(numbers) < 2:
+            yield "I'd be happy to help you with division, but I need at least two numbers to perform this operation. Could you please provide more numerical data? For example, you could ask 'What's the result of dividing 100 by 4 and then by 2?'"
+            return
+        if 0 in numbers[1:]:
+            yield "I apologize, but I can't divide by zero. Division by zero is undefined in mathematics. Could you please provide a non-zero divisor?"
+            return
+        
+        yield ("Performing Division\n\n"
+               "Initial Explanation\n"
+               "In division, we start with the first number and divide it by each subsequent number in order.\n\n")
+        
+        with metrics.timer('compute', query_type):
+            result = stats_engine.quotient(numbers)
+        
+        yield ("Mathematical Solution\n"
+               "Step-by-step Process:\n\n"
+               f"1. Start with the first number: {numbers[0]}\n")
+        yield f"2. Divide by each subsequent number: ÷ {stats_engine.format_values(numbers[1:], ' ÷ ')}\n"
+        yield f"3. Perform the calculation: {numbers[0]} ÷ {stats_engine.format_values(numbers[1:], ' ÷ ')} ≈ {result:.4f}\n\n"
+        yield ("Concept Summary\n"
+               "Division is a fundamental operation in mathematics, used to distribute a quantity into equal parts or to find out how many times one quantity is contained within another. It's the inverse of multiplication and is crucial in various fields, from basic arithmetic to advanced scientific calculations.")
+
+def calculation_error_message(error):
+    logger.error("Error in calculation: %s", error)
+    return f"I apologize, but I encountered an error while processing your query: {str(error)}. Could you please check your input and try again? If you're not sure how to phrase your question, feel free to ask for examples of calculations I can perform."
+
+# Rendered responses are memoized in a SQLite file shared by every worker
+# process, keyed by the canonical query: the intent plus the extracted numbers,
+# or the normalized expression text. Greetings, compliments, unknown queries
+# and statistics over fewer than RESULT_CACHE_MIN_NUMBERS values are cheaper
+# to render than to look up, so they bypass it, as do responses that depended
+# on a SymPy deadline. Set SADHAK_RESULT_CACHE=off to disable it, or to a path
+# to choose where the file lives (by default under the user's cache directory;
+# a path in a directory other users can write to disables the cache). Bump
+# RESULT_CACHE_VERSION whenever response text or keys change, so a deploy
+# doesn't serve entries rendered by the old code.
+RESULT_CACHE_VERSION = 3
+RESULT_CACHE_PATH = os.environ.get('SADHAK_RESULT_CACHE', result_cache.default_path())
+RESULT_CACHE_SIZE = int(os.environ.get('SADHAK_RESULT_CACHE_SIZE', 10000))
+RESULT_CACHE_TTL = float(os.environ.get('SADHAK_RESULT_CACHE_TTL', 86400))
+RESULT_CACHE_MIN_NUMBERS = int(os.environ.get('SADHAK_RESULT_CACHE_MIN_NUMBERS', 32))
+
+def _open_result_cache():
+    if RESULT_CACHE_PATH.lower() in ('', '0', 'off'):
+        return None
+    try:
+        return result_cache.ResultCache(RESULT_CACHE_PATH, RESULT_CACHE_SIZE, RESULT_CACHE_TTL)
+    except (OSError, result_cache.UnsafeCachePath) as e:
+        logger.warning("Result cache disabled: %s", e)
+        return None
+
+RESULT_CACHE = _open_result_cache()
+RESULT_CACHE_LOOKUPS = metrics.Counter('sadhak_result_cache_total',
+                                       'Result cache lookups by outcome (hit, miss, bypass) and intent; '
+                                       '"error" counts failed cache reads and writes.',
+                                       ('result', 'intent'))
+
+def result_cache_key(prompt, analysis):
+    """Return the cache key for a prompt, or None when it should bypass the cache."""
+    intent = _response_intent(analysis)
+    if intent == 'expression':
+        # The raw text, not the normalized one: spacing changes how bindings
+        # are split off, and the response echoes the expression as written.
+        canonical = _expression_text(prompt).encode()
+    elif intent in STATISTICS_OPERATIONS and len(analysis.numbers) >= RESULT_CACHE_MIN_NUMBERS:
+        canonical = array('d', analysis.numbers).tobytes()
+    else:
+        return None
+    digest = hashlib.blake2b(f"{RESULT_CACHE_VERSION}:{intent}:".encode(), digest_size=16)
+    digest.update(canonical)
+    return digest.digest()
+
+def _cache_call(intent, method, *args):
+    try:
+        return method(*args)
+    except sqlite3.Error as e:
+        RESULT_CACHE_LOOKUPS.inc('error', intent)
+        logger.warning("Result cache unavailable: %s", e)
+        return None
+
+def iter_cached_response(prompt, analysis=None, stream=False):
+    if analysis is None:
+        analysis = analyze_prompt_timed(prompt)
+    intent = _response_intent(analysis)
+    key = None if RESULT_CACHE is None else result_cache_key(prompt, analysis)
+    if key is None:
+        RESULT_CACHE_LOOKUPS.inc('bypass', intent)
+        yield from iter_response(prompt, analysis, stream)
+        return
+
+    started = time.perf_counter()
+    with metrics.timer('cache_lookup', intent):
+        cached = _cache_call(intent, RESULT_CACHE.get, key)
+    if cached is not None:
+        RESULT_CACHE_LOOKUPS.inc('hit', intent)
+        metrics.count_request(intent, time.perf_counter() - started)
+        yield cached
+        return
+    RESULT_CACHE_LOOKUPS.inc('miss', intent)
+
+    _response_state.uncacheable = False
+    sections = []
+    for section in iter_response(prompt, analysis, stream):
+        sections.append(section)
+        yield section
+    if not _response_state.uncacheable:
+        with metrics.timer('cache_store', intent):
+            _cache_call(intent, RESULT_CACHE.put, key, ''.join(sections))
+
+def generate_response(prompt, max_length=20, analysis=None):
+    try:
+        return ''.join(iter_cached_response(prompt, analysis))
+    except Exception as e:
+        return calculation_error_message(e)
+
+# Requests that carry a session_id keep the latest dataset on the server:
+# "add 4, 9, 12" appends to it and a statistics question without numbers
+# ("now what's the median") is answered from running statistics, so follow-ups
+# cost time proportional to the new values rather than the whole dataset.
+SESSIONS_MAX = int(os.environ.get('SADHAK_SESSIONS_MAX', 256))
+SESSION_MAX_VALUES = int(os.environ.get('SADHAK_SESSION_MAX_VALUES', 200000))
+SESSION_IDLE_SECONDS = float(os.environ.get('SADHAK_SESSION_IDLE_SECONDS', 1800))
+SESSION_ID_MAX_LENGTH = 128
+SESSION_OPERATIONS = ('mean', 'median', 'mode', 'sum')
+SESSION_ADD_PATTERN = re.compile(r'^\W*(?:(?:now|then|also|and|please)\s+)*(?:add|append|include)\b', re.IGNORECASE)
+
+SESSIONS = sessions.SessionStore(SESSIONS_MAX, SESSION_MAX_VALUES, SESSION_IDLE_SECONDS)
+
+def session_id_from(data):
+    session_id = data.get('session_id')
+    if session_id is not None and (not isinstance(session_id, str) or not 0 < len(session_id) <= SESSION_ID_MAX_LENGTH):
+        raise ValueError(f"session_id must be a string of 1 to {SESSION_ID_MAX_LENGTH} characters")
+    return session_id
+
+def _format_modes(modes, max_count, mode_count):
+    # modes may be a preview of the first few of mode_count modes.
+    if mode_count == 1:
+        return f"{modes[0]}, appearing {max_count} time{'s' if max_count > 1 else ''}"
+    if mode_count > len(modes):
+        listed = (f"{', '.join(map(str, modes[:stats_engine.PREVIEW_SIZE]))}, … "
+                  f"({mode_count - stats_engine.PREVIEW_SIZE:,} more)")
+    else:
+        listed = stats_engine.format_values(modes, ', ')
+    return f"{listed}, each appearing {max_count} time{'s' if max_count > 1 else ''}"
+
+def _iter_session_add(session, values):
+    with session.lock:
+        try:
+            with metrics.timer('session_update', 'session_add'):
+                session.add(values)
+        except sessions.SessionFull as e:
+            full = e
+        else:
+            full = None
+            count, total, mean = len(session), session.total(), session.mean()
+            deviation = math.sqrt(session.variance())
+            median = session.median()[0]
+            max_count, mode_count, modes = session.mode_preview(stats_engine.RENDER_LIMIT)
+
+    if full is not None:
+        yield f"I couldn't add those numbers because {full}. Start a new chat to begin a fresh dataset, or ask about the values you already have."
+        return
+    yield ("Updating Your Dataset\n\n"
+           f"Added {stats_engine.format_values(values, ', ')}. The dataset in this conversation now holds {count:,} value{'s' if count > 1 else ''}.\n\n")
+    yield ("Running Statistics:\n\n"
+           f"Sum = {total}\n"
+           f"Mean = {mean:.1f}\n"
+           f"Median = {median}\n"
+           f"Mode = {_format_modes(modes, max_count, mode_count)}\n"
+           f"Standard deviation = {deviation:.4f}\n\n")
+    yield ("Concept Summary\n"
+           "Running statistics update with each new value instead of starting over: the total and mean absorb the new numbers directly, and the median and mode are kept ready as values arrive. Ask for the mean, median, mode or sum at any point to see the details.")
+
+def _iter_session_operation(query_type, session):
+    with session.lock, metrics.timer('compute', query_type):
+        count = len(session)
+        if query_type in ('mean', 'sum'):
+            total, mean = session.total(), session.mean()
         elif query_type == 'median':
-            if not numbers:
-                return "I'd be happy to help you find the median, but I couldn't find any numbers in your query. Could you please provide some numerical data? For example, you could ask 'What's the median of 10, 15, 20, 25, and 30?'"
-            
-            sorted_nums = sorted(numbers)
-            n = len(sorted_nums)
-            median = statistics.median(numbers)
-            
-            response = "Finding the Median\n\n"
-            response += "Initial Explanation\n"
-            response += "The median is the middle value in a sorted dataset. It's a robust measure of central tendency, less affected by extreme values or outliers compared to the mean.\n\n"
-            response += "Mathematical Solution\n"
-            response += "Sort the Numbers:\n\n"
-            response += f"First, we arrange the numbers in ascending order: {', '.join(map(str, sorted_nums))}\n\n"
-            response += "Find the Middle Value:\n\n"
-            if n % 2 == 0:
-                response += f"Since we have an even number of values ({n}), we take the average of the two middle numbers.\n"
-                response += f"The two middle numbers are {sorted_nums[n//2-1]} and {sorted_nums[n//2]}.\n"
-                response += f"Median = ({sorted_nums[n//2-1]} + {sorted_nums[n//2]}) / 2 = {median}\n\n"
-            else:
-                response += f"Since we have an odd number of values ({n}), we take the middle number.\n"
-                response += f"The middle number is {median}.\n\n"
-            response += "Concept Summary\n"
-            response += "The median is particularly useful when dealing with skewed distributions or when you want to find the 'middle' value in a dataset. It's less sensitive to extreme values compared to the mean, making it a good choice for datasets with outliers."
-            
-            return response
-
-        elif query_type == 'expression':
-            expression_match = re.search(r'(calculate|evaluate|simplify)\s*(.*)', prompt, re.IGNORECASE)
-            expression = expression_match.group(2) if expression_match else prompt
-            
-            result = evaluate_expression(expression)
-            
-            if 'Error' in result:
-                return f"I apologize, but I encountered an error while evaluating the expression: {result}\n\nCould you please check the expression and try again? Make sure all operations are clearly stated and parentheses are properly balanced. If you're not sure how to format the expression, feel free to ask for examples."
-            
-            response = "Evaluating the Expression\n\n"
-            response += "Initial Explanation\n"
-            response += f"We'll evaluate the expression: {expression}. To solve this, we'll apply mathematical rules and operations in the correct order. This may involve simplifying fractions, combining like terms, or solving for variables.\n\n"
-            response += "Mathematical Solution\n"
-            response += "Step-by-step Evaluation:\n\n"
-            response += f"1. Start with the original expression: {expression}\n"
-            response += f"2. Apply mathematical rules and simplify: {result}\n\n"
-            response += "Concept Summary\n"
-            response += "This process of simplification and evaluation is crucial in algebra and calculus. It allows us to reduce complex expressions to their simplest form, making it easier to understand the relationships between variables or to find specific values."
-            
-            return response
-
-        elif query_type == 'sum':
-            if not numbers:
-                return "I'd be happy to help you calculate the sum, but I couldn't find any numbers in your query. Could you please provide some numerical data? For example, you could ask 'What's the sum of 5, 10, 15, 20, and 25?'"
-            
-            total = sum(numbers)
-            
-            response = "Calculating the Sum\n\n"
-            response += "Initial Explanation\n"
-            response += "The sum is the total obtained by adding all the numbers together. It's a fundamental operation in mathematics used in various calculations and analyses.\n\n"
-            response += "Mathematical Solution\n"
-            response += "Add All Numbers:\n\n"
-            response += f"{' + '.join(map(str, numbers))} = {total}\n\n"
-            response += "Concept Summary\n"
-            response += "The sum is useful in many contexts, such as calculating totals in financial statements, finding the total distance traveled in physics problems, or as a step in calculating averages."
-            
-            return response
-
-        elif query_type == 'subtract':
-            if len(numbers) < 2:
-                return "I'd be happy to help you with subtraction, but I need at least two numbers to perform this operation. Could you please provide more numerical data? For example, you could ask 'What's the result of subtracting 15 and 7 from 100?'"
-            
-            result = numbers[0] - sum(numbers[1:])
-            
-            response = "Performing Subtraction\n\n"
-            response += "Initial Explanation\n"
-            response += "In subtraction, we start with the first number and subtract all subsequent numbers from it.\n\n"
-            response += "Mathematical Solution\n"
-            response += "Step-by-step Process:\n\n"
-            response += f"1. Start with the first number: {numbers[0]}\n"
-            response += f"2. Subtract the following numbers: {' - '.join(map(str, numbers[1:]))}\n"
-            response += f"3. Perform the calculation: {numbers[0]} - ({' + '.join(map(str, numbers[1:]))}) = {result}\n\n"
-            response += "Concept Summary\n"
-            response += "Subtraction is a fundamental operation in mathematics, used to find the difference between values. It's essential in various real-world scenarios, from financial calculations to scientific measurements."
-            
-            return response
-
-        elif query_type == 'multiply':
-            if not numbers:
-                return "I'd be happy to help you with multiplication, but I couldn't find any numbers in your query. Could you please provide some numerical data? For example, you could ask 'What's the product of 2, 3, 4, and 5?'"
-            
-            product = math.prod(numbers)
-            
-            response = "Performing Multiplication\n\n"
-            response += "Initial Explanation\n"
-            response += "Multiplication is the process of adding a number to itself a specified number of times. When multiplying multiple numbers, we find the product of all the numbers.\n\n"
-            response += "Mathematical Solution\n"
-            response += "Multiply All Numbers:\n\n"
-            response += f"{' × '.join(map(str, numbers))} = {product}\n\n"
-            response += "Concept Summary\n"
-            response += "Multiplication is a fundamental operation in mathematics, often thought of as repeated addition. It's used in various fields, from calculating areas and volumes to more complex applications in physics and engineering."
-            
-            return response
-
-        elif query_type == 'divide':
-            if len(numbers) < 2:
-                return "I'd be happy to help you with division, but I need at least two numbers to perform this operation. Could you please provide more numerical data? For example, you could ask 'What's the result of dividing 100 by 4 and then by 2?'"
-            if 0 in numbers[1:]:
-                return "I apologize, but I can't divide by zero. Division by zero is undefined in mathematics. Could you please provide a non-zero divisor?"
-            
-            result = numbers[0]
-            for num in numbers[1:]:
-                result /= num
-            
-            response = "Performing Division\n\n"
-            response += "Initial Explanation\n"
-            response += "In division, we start with the first number and divide it by each subsequent number in order.\n\n"
-            response += "Mathematical Solution\n"
-            response += "Step-by-step Process:\n\n"
-            response += f"1. Start with the first number: {numbers[0]}\n"
-            response += f"2. Divide by each subsequent number: ÷ {' ÷ '.join(map(str, numbers[1:]))}\n"
-            response += f"3. Perform the calculation: {numbers[0]} ÷ {' ÷ '.join(map(str, numbers[1:]))} ≈ {result:.4f}\n\n"
-            response += "Concept Summary\n"
-            response += "Division is a fundamental operation in mathematics, used to distribute a quantity into equal parts or to find out how many times one quantity is contained within another. It's the inverse of multiplication and is crucial in various fields, from basic arithmetic to advanced scientific calculations."
-            
-            return response
+            median, lower_middle, upper_middle = session.median()
+        else:
+            max_count, mode_count, modes = session.mode_preview(stats_engine.RENDER_LIMIT)
+            listed = stats_engine.format_counts(session.counts) if len(session.counts) <= stats_engine.RENDER_LIMIT else ''
 
+    dataset = f"Using the {count:,} value{'s' if count > 1 else ''} collected in this conversation so far.\n\n"
+    if query_type == 'mean':
+        yield "Calculating the Mean\n\n" + dataset
+        yield ("Mathematical Solution\n"
+               f"Mean = Sum / Count = {total} / {count} = {mean:.1f}\n\n")
+    elif query_type == 'sum':
+        yield "Calculating the Sum\n\n" + dataset
+        yield ("Mathematical Solution\n"
+               f"Sum = {total}\n\n")
+    elif query_type == 'median':
+        yield "Finding the Median\n\n" + dataset
+        step = "Mathematical Solution\n"
+        if count % 2 == 0:
+            step += f"With an even number of values, the median is the average of the two middle numbers, {lower_middle} and {upper_middle}.\n"
+            step += f"Median = ({lower_middle} + {upper_middle}) / 2 = {median}\n\n"
         else:
-            return "I'm not quite sure how to interpret your query. Could you please rephrase it or specify the type of calculation you want to perform? For example, you could ask about calculating the mean, median, mode, or perform basic arithmetic operations like addition, subtraction, multiplication, or division. I'm here to help with a wide range of mathematical calculations!"
+            step += f"With an odd number of values, the median is the middle number: {median}.\n\n"
+        yield step
+    else:
+        yield "Finding the Mode\n\n" + dataset
+        yield ("Mathematical Solution\n"
+               + (f"Count the Occurrences:\n\n{listed}\n" if listed else '')
+               + f"The mode is {_format_modes(modes, max_count, mode_count)}.\n\n")
+    yield ("Concept Summary\n"
+           "These values were kept up to date as numbers were added, so the answer comes straight from the running totals and ordering without re-reading the whole dataset.")
+
+def _remember_dataset(session_id, numbers):
+    session = SESSIONS.get(session_id)
+    with session.lock, metrics.timer('session_update', 'session_load'):
+        try:
+            session.replace(numbers)
+        except sessions.SessionFull:
+            # Too large to keep; follow-ups will ask for the numbers again.
+            session.clear()
+
+def iter_session_response(session_id, prompt, analysis=None, stream=False):
+    if analysis is None:
+        analysis = analyze_prompt_timed(prompt)
+    intent = _response_intent(analysis)
+    session = SESSIONS.get(session_id, create=False)
+    has_dataset = session is not None and len(session) > 0
+    # "Add 5 and 7" appends to a dataset the conversation already has; in a
+    # fresh conversation it is an ordinary sum.
+    if has_dataset and analysis.numbers and intent not in ('greeting', 'compliment') and SESSION_ADD_PATTERN.match(prompt):
+        yield from metrics.track_sections(_iter_session_add(session, analysis.numbers), 'session_add')
+        return
+    if has_dataset and intent in SESSION_OPERATIONS and not analysis.numbers:
+        yield from metrics.track_sections(_iter_session_operation(intent, session), intent)
+        return
 
+    yield from iter_cached_response(prompt, analysis, stream)
+    if intent in STATISTICS_OPERATIONS and analysis.numbers:
+        _remember_dataset(session_id, analysis.numbers)
+
+def generate_session_response(session_id, prompt, analysis=None):
+    try:
+        return ''.join(iter_session_response(session_id, prompt, analysis))
     except Exception as e:
-        print(f"Error in calculation: {str(e)}")
-        return f"I apologize, but I encountered an error while processing your query: {str(e)}. Could you please check your input and try again? If you're not sure how to phrase your question, feel free to ask for examples of calculations I can perform."
+        return calculation_error_message(e)
+
+@app.before_request
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+
+def record_first_response(started):
+    # Called by the generate routes once a response body is complete, so the
+    # timing covers the cold-start work of a first real query rather than a
+    # static file or a readiness probe.
+    if STARTUP_TIMINGS['first_request_seconds'] is None:
+        STARTUP_TIMINGS['first_request_seconds'] = time.perf_counter() - started
+
+@app.route('/startup')
+def startup():
+    return jsonify(STARTUP_TIMINGS)
+
+STARTUP_SECONDS = metrics.Gauge('sadhak_startup_seconds', 'Import, warm-up and first-request latency.', ('phase',))
+
+@app.route('/metrics')
+def metrics_endpoint():
+    for phase, seconds in STARTUP_TIMINGS.items():
+        if seconds is not None:
+            STARTUP_SECONDS.set(phase.replace('_seconds', ''), value=seconds)
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/')
 def index():
     try:
         return send_from_directory('.', 'index.html')
     except Exception as e:
-        print(f"Error in index route: {str(e)}")
+        logger.error("Error in index route: %s", e)
         return f"Error: {str(e)}", 500
 
 @app.route('/styles.css')
@@ -305,7 +1111,7 @@ def styles():
     try:
         return send_from_directory('.', 'styles.css')
     except Exception as e:
-        print(f"Error serving styles.css: {str(e)}")
+        logger.error("Error serving styles.css: %s", e)
         return f"Error: {str(e)}", 500
 
 @app.route('/script.js')
@@ -313,7 +1119,7 @@ def script():
     try:
         return send_from_directory('.', 'script.js')
     except Exception as e:
-        print(f"Error serving script.js: {str(e)}")
+        logger.error("Error serving script.js: %s", e)
         return f"Error: {str(e)}", 500
 
 @app.route('/generate', methods=['POST'])
@@ -321,39 +1127,328 @@ def generate():
     try:
         data = request.json
         prompt = data['prompt']
-        response = generate_response(prompt)
+        session_id = session_id_from(data)
+        if session_id is None:
+            response = generate_response(prompt)
+        else:
+            response = generate_session_response(session_id, prompt)
+        record_first_response(g.request_start)
         return jsonify({'response': response})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error("Error in generate route: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+def sse_event(data, event=None):
+    frame = f"event: {event}\n" if event else ''
+    return frame + f"data: {json.dumps(data)}\n\n"
+
+@app.route('/generate/stream', methods=['POST'])
+def generate_stream():
+    try:
+        data = request.json
+        prompt = data['prompt']
+        session_id = session_id_from(data)
+    except Exception as e:
+        logger.error("Error in stream route: %s", e)
+        return jsonify({'error': str(e)}), 400
+    started = g.request_start
+
+    def events():
+        try:
+            if session_id is None:
+                chunks = iter_cached_response(prompt, stream=True)
+            else:
+                chunks = iter_session_response(session_id, prompt, stream=True)
+            for chunk in chunks:
+                yield sse_event({'chunk': chunk})
+        except Exception as e:
+            yield sse_event({'chunk': calculation_error_message(e)})
+        record_first_response(started)
+        yield sse_event({}, event='done')
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/session/<session_id>', methods=['DELETE'])
+def delete_session(session_id):
+    return jsonify({'deleted': SESSIONS.drop(session_id)})
+
+# Structured uploads for the statistics operations: a JSON number array, a CSV
+# column, or a raw little-endian float64 buffer. CSV is parsed a chunk at a
+# time and binary data is viewed in place, so large uploads go straight into
+# NumPy arrays instead of lists of Python floats.
+DATASET_OPERATIONS = ('mean', 'median', 'mode', 'sum', 'multiply', 'divide')
+DATASET_MAX_BYTES = int(os.environ.get('SADHAK_DATASET_MAX_BYTES', 1 << 30))
+CSV_CHUNK_BYTES = int(os.environ.get('SADHAK_CSV_CHUNK_BYTES', 1 << 20))
+# Uploads are the largest bodies any route accepts. The route checks
+# Content-Length up front; chunked uploads have none, so their streams raise
+# RequestEntityTooLarge once they pass the limit.
+app.config['MAX_CONTENT_LENGTH'] = DATASET_MAX_BYTES
+
+def _read_upload():
+    # request.get_data() quietly stops at the limit on a chunked upload;
+    # reading to the end makes the stream raise instead.
+    body = bytearray()
+    while True:
+        chunk = request.stream.read(CSV_CHUNK_BYTES)
+        if not chunk:
+            return body
+        body.extend(chunk)
+        if len(body) > DATASET_MAX_BYTES:
+            raise RequestEntityTooLarge()
+
+def _read_json_dataset():
+    try:
+        data = json.loads(_read_upload())
+    except ValueError:
+        data = None
+    if isinstance(data, dict):
+        data = data.get('data')
+    if not isinstance(data, list):
+        raise ValueError("expected a JSON array of numbers or an object with a 'data' array")
+    # NumPy would quietly turn null into NaN, "2" into 2.0 and true into 1.0,
+    # and nested arrays into a grid; only plain JSON numbers are accepted.
+    if not set(map(type, data)) <= {int, float}:
+        index, value = next((i, v) for i, v in enumerate(data) if type(v) not in (int, float))
+        raise ValueError(f"expected a flat array of numbers, but item {index} is {json.dumps(value)[:40]}")
+    np = stats_engine.load_numpy()
+    return np.asarray(data, dtype=np.float64)
+
+def _read_binary_dataset():
+    body = _read_upload()
+    if len(body) % 8:
+        raise ValueError(f"binary upload is {len(body)} bytes, not a whole number of float64 values")
+    np = stats_engine.load_numpy()
+    return np.frombuffer(memoryview(body), dtype='<f8')
+
+def _iter_csv_column(stream, column):
+    # Rows are split on newlines per chunk, so quoted fields spanning lines are
+    # not supported.
+    np = stats_engine.load_numpy()
+    index = int(column) if column.isdigit() else None
+    first_row = True
+    remainder = b''
+    while True:
+        chunk = stream.read(CSV_CHUNK_BYTES)
+        data = remainder + chunk
+        if chunk:
+            cut = data.rfind(b'\n') + 1
+            data, remainder = data[:cut], data[cut:]
+        if data:
+            rows = csv.reader(io.StringIO(data.decode('utf-8-sig' if first_row else 'utf-8')))
+            if first_row:
+                header = next(rows, None)
+                first_row = False
+                if header is not None:
+                    if index is None:
+                        if column not in header:
+                            raise ValueError(f"CSV has no column named {column!r}")
+                        index = header.index(column)
+                    else:
+                        field = header[index].strip() if len(header) > index else ''
+                        try:
+                            first_value = float(field) if field else None
+                        except ValueError:
+                            first_value = None  # a header row
+                        if first_value is not None:
+                            yield np.asarray([first_value])
+            values = [row[index] for row in rows if len(row) > index and row[index].strip()]
+            if values:
+                yield np.asarray(values, dtype=np.float64)
+        if not chunk:
+            break
+
+def _read_csv_dataset():
+    np = stats_engine.load_numpy()
+    chunks = list(_iter_csv_column(request.stream, request.args.get('column', '0')))
+    return np.concatenate(chunks) if chunks else np.empty(0)
+
+def compute_dataset_operation(operation, values):
+    if operation == 'mean':
+        return stats_engine.mean(values)
+    if operation == 'median':
+        return stats_engine.median(values)[0]
+    if operation == 'mode':
+        _, _, modes = stats_engine.mode(values)
+        return modes
+    if operation == 'sum':
+        return stats_engine.total(values)
+    if operation == 'multiply':
+        return stats_engine.product(values)
+    if len(values) < 2:
+        raise ValueError("division needs at least two values")
+    if (values[1:] == 0).any():
+        raise ValueError("can't divide by zero")
+    return stats_engine.quotient(values)
+
+def _json_number(result):
+    # JSON has no inf or nan (an overflowing sum, a NaN in a binary upload), so
+    # they are reported as null.
+    if isinstance(result, list):
+        return [_json_number(value) for value in result]
+    return result if math.isfinite(result) else None
+
+def _upload_too_large():
+    return jsonify({'error': f"upload too large (limit {DATASET_MAX_BYTES} bytes)"}), 413
+
+@app.route('/dataset/<operation>', methods=['POST'])
+def dataset(operation):
+    if operation not in DATASET_OPERATIONS:
+        return jsonify({'error': f"unknown operation {operation!r}; expected one of {', '.join(DATASET_OPERATIONS)}"}), 404
+    if request.content_length is not None and request.content_length > DATASET_MAX_BYTES:
+        return _upload_too_large()
+
+    try:
+        if request.mimetype == 'application/json':
+            values = _read_json_dataset()
+        elif request.mimetype == 'text/csv':
+            values = _read_csv_dataset()
+        elif request.mimetype == 'application/octet-stream':
+            values = _read_binary_dataset()
+        else:
+            return jsonify({'error': f"unsupported content type {request.mimetype!r}; send application/json, text/csv or application/octet-stream"}), 415
+        if len(values) == 0:
+            return jsonify({'error': "the dataset is empty"}), 400
+        result = _json_number(compute_dataset_operation(operation, values))
+        payload = {'operation': operation, 'count': len(values), 'result': result}
+        if request.args.get('explain') in ('1', 'true'):
+            payload['response'] = ''.join(iter_operation(operation, values))
+        return jsonify(payload)
+    except RequestEntityTooLarge:
+        return _upload_too_large()
+    except (ValueError, TypeError, OverflowError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error("Error in dataset route: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+def _generate_batch_item(prompt):
+    # Runs inside a batch worker; errors are reported per item so one bad prompt
+    # doesn't fail the whole batch.
+    try:
+        if not isinstance(prompt, str):
+            raise TypeError(f"prompt must be a string, got {type(prompt).__name__}")
+        return {'response': generate_response(prompt)}
+    except Exception as e:
+        return {'error': str(e)}
+
+def _init_batch_worker():
+    # Each batch worker already runs off the request thread; one SymPy worker
+    # apiece keeps the deadline without multiplying the process count.
+    global SYMPY_WORKERS
+    SYMPY_WORKERS = min(SYMPY_WORKERS, 1)
+    detach_from_server()
+
+def get_batch_pool():
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            _batch_pool = ProcessPoolExecutor(max_workers=max(1, BATCH_WORKERS), initializer=_init_batch_worker)
+        return _batch_pool
+
+def _drop_batch_pool(pool):
+    # Another request may already have replaced it.
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is pool:
+            _batch_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def generate_batch(prompts, chunk_size=None):
+    if chunk_size is None:
+        chunk_size = BATCH_CHUNK_SIZE
+    if len(prompts) <= 1 or BATCH_WORKERS <= 1:
+        return [_generate_batch_item(prompt) for prompt in prompts]
+    # Executor.map keeps results in input order; chunking amortises the IPC cost
+    # of sending many small prompts to the workers. A worker that dies (killed,
+    # out of memory) breaks the whole executor, so it is replaced and the batch
+    # retried once.
+    for attempt in range(2):
+        pool = get_batch_pool()
+        try:
+            return list(pool.map(_generate_batch_item, prompts, chunksize=max(1, chunk_size)))
+        except BrokenProcessPool:
+            logger.warning("Batch worker died; restarting the batch pool")
+            _drop_batch_pool(pool)
+            if attempt:
+                raise
+
+@app.route('/generate/batch', methods=['POST'])
+def generate_batch_route():
+    # Malformed requests are the client's fault; only failures while
+    # generating are reported as 500.
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or 'prompts' not in data:
+        return jsonify({'error': "expected a JSON object with a 'prompts' list"}), 400
+    prompts = data['prompts']
+    if not isinstance(prompts, list):
+        return jsonify({'error': "'prompts' must be a list"}), 400
+    if len(prompts) > BATCH_MAX_PROMPTS:
+        return jsonify({'error': f"batch too large: {len(prompts)} prompts (limit {BATCH_MAX_PROMPTS})"}), 413
+    chunk_size = data.get('chunk_size', BATCH_CHUNK_SIZE)
+    if isinstance(chunk_size, bool) or not isinstance(chunk_size, int) or chunk_size < 1:
+        return jsonify({'error': "'chunk_size' must be a positive integer"}), 400
+    try:
+        results = generate_batch(prompts, chunk_size)
+        record_first_response(g.request_start)
+        return jsonify({'results': results})
     except Exception as e:
-        print(f"Error in generate route: {str(e)}")
+        logger.error("Error in batch generate route: %s", e)
         return jsonify({'error': str(e)}), 500
 
+# Sample prompts covering every intent, used by the --self-test startup check.
+TEST_PROMPTS = [
+    "Hi there!",
+    "Thank you for your help!",
+    "Good morning, Sadhak!",
+    "You're awesome!",
+    "What's the mode of these numbers: 1, 2, 3, 3, 4, 4, 5, 5, 5?",
+    "Can you find the average of 10, 15, 20, 25, and 30?",
+    "What's the sum of 5, 10, 15, 20, and 25?",
+    "If I have 100 and subtract 20, 15, and 5, what's left?",
+    "Multiply 2, 3, 4, and 5 together.",
+    "Divide 100 by 2, then by 5.",
+    "What's the most common fruit among: apple, banana, apple, orange, banana, apple?",
+    "How many books on average did students read if one read 3, another 5, and a third read 4?",
+    "A teacher recorded the number of books read by six students over the summer: Student A: 10 books Student B: 15 books Student C: 8 books Student D: 12 books Student E: 9 books Student F: 14 books What is the median number of books read by the students?",
+    "Calculate 2 + 3 * 4.",
+    "What is the result of (8 + 2) / 5?",
+    "Evaluate 2x^2 + 3x - 5 when x=3.",
+    "Simplify (x^2 + 2x + 1)/(x + 1).",
+]
+
+STARTUP_TIMINGS['import_seconds'] = time.perf_counter() - _MODULE_START
+
+# Servers that import the app once and then fork (e.g. gunicorn --preload) can
+# set SADHAK_PREFORK_WARMUP=1 to load SymPy and NumPy in the master before
+# forking; each worker then starts its SymPy pool on first use.
+if os.environ.get('SADHAK_PREFORK_WARMUP') == '1':
+    warm_up()
+
 if __name__ == '__main__':
-    print("Starting Sadhak Calculator server...")
-    
-    # Test cases
-    test_prompts = [
-        "Hi there!",
-        "Thank you for your help!",
-        "Good morning, Sadhak!",
-        "You're awesome!",
-        "What's the mode of these numbers: 1, 2, 3, 3, 4, 4, 5, 5, 5?",
-        "Can you find the average of 10, 15, 20, 25, and 30?",
-        "What's the sum of 5, 10, 15, 20, and 25?",
-        "If I have 100 and subtract 20, 15, and 5, what's left?",
-        "Multiply 2, 3, 4, and 5 together.",
-        "Divide 100 by 2, then by 5.",
-        "What's the most common fruit among: apple, banana, apple, orange, banana, apple?",
-        "How many books on average did students read if one read 3, another 5, and a third read 4?",
-        "A teacher recorded the number of books read by six students over the summer: Student A: 10 books Student B: 15 books Student C: 8 books Student D: 12 books Student E: 9 books Student F: 14 books What is the median number of books read by the students?",
-        "Calculate 2 + 3 * 4.",
-        "What is the result of (8 + 2) / 5?",
-        "Evaluate 2x^2 + 3x - 5 when x=3.",
-        "Simplify (x^2 + 2x + 1)/(x + 1).",
-    ]
-    
-    for i, prompt in enumerate(test_prompts, 1):
-        print(f"\nTest case {i}:")
-        print("Input:", prompt)
-        print("Result:", generate_response(prompt))
-    
-    app.run(debug=True, port=5001)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Sadhak Calculator server")
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--debug', action=argparse.BooleanOptionalAction, default=True,
+                        help="run with the Flask debugger and reloader (default: on)")
+    parser.add_argument('--prefork-warmup', action='store_true',
+                        help="import and prime SymPy before starting the worker pools")
+    parser.add_argument('--self-test', action='store_true',
+                        help="run the sample prompts through generate_response before serving")
+    args = parser.parse_args()
+
+    logger.info("Starting Sadhak Calculator server...")
+
+    if args.prefork_warmup:
+        if STARTUP_TIMINGS['warmup_seconds'] is None:
+            warm_up(start_pool=True)
+        elif SYMPY_WORKERS > 0:
+            get_sympy_pool()
+
+    if args.self_test:
+        for i, prompt in enumerate(TEST_PROMPTS, 1):
+            logger.info("Test case %d:\nInput: %s\nResult: %s", i, prompt, generate_response(prompt))
+
+    logger.info("Startup timings: %s", STARTUP_TIMINGS)
+    app.run(debug=args.debug, port=args.port, threaded=True)
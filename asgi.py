@@ -0,0 +1,395 @@
+"""Async (ASGI) serving mode for Sadhak Calculator.
+
+Serves the chat routes of the Flask app (``/``, ``/generate``,
+``/generate/stream``, ``DELETE /session/<id>``, ``/startup``, ``/metrics`` and
+the static files) from an event loop; the upload and batch routes
+(``/dataset/<operation>`` and ``/generate/batch``) are only served by the Flask
+app. Each prompt is routed to a lane by intent:
+
+- ``fast``: greetings, compliments, unknown queries and small arithmetic,
+  answered inline on the loop in microseconds
+- ``cached``: the other in-process prompts whose responses go through the
+  result cache (statistics over RESULT_CACHE_MIN_NUMBERS or more values), run
+  in a thread pool so the SQLite reads and writes never block the loop
+- ``stats``: statistics over large inputs, run in a process pool
+- ``expression``: symbolic evaluation, run in a thread pool whose threads wait
+  on the deadline-bounded SymPy workers
+
+Requests that carry a ``session_id`` all run in the ``session`` lane's thread
+pool: they must stay in this process, where the session's dataset lives, and
+may wait on the session's lock, which must never happen on the loop.
+
+Every lane has its own concurrency limit and a bounded wait queue, so a burst of
+slow symbolic queries never delays fast ones. A request that finds its lane's
+queue full gets 429 right away. One that waits longer than
+SADHAK_ASYNC_QUEUE_TIMEOUT for a slot gets 503.
+
+Run with any ASGI server, e.g.:
+
+    uvicorn asgi:app --port 5001
+    python asgi.py --port 5001
+"""
+import argparse
+import asyncio
+import json
+import mimetypes
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import app as sadhak
+import metrics
+import stats_engine
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC_FILES = {
+    '/': 'index.html',
+    '/styles.css': 'styles.css',
+    '/script.js': 'script.js',
+}
+
+MAX_BODY_BYTES = int(os.environ.get('SADHAK_ASYNC_MAX_BODY_BYTES', 64 << 20))
+QUEUE_TIMEOUT = float(os.environ.get('SADHAK_ASYNC_QUEUE_TIMEOUT', 2.0))
+# Prompts longer than this skip intent detection on the event loop and go
+# straight to the stats lane, so scanning a huge dataset never blocks the loop.
+LARGE_PROMPT_CHARS = int(os.environ.get('SADHAK_ASYNC_LARGE_PROMPT_CHARS', 20000))
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Lane:
+    def __init__(self, name, limit, queue_size, executor=None):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.executor = executor
+        self.pending = 0
+        self._slots = None
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.pending >= self.limit + self.queue_size:
+            raise HTTPError(429, f"the {self.name} lane is full; try again shortly")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.limit)
+
+        self.pending += 1
+        try:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), QUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise HTTPError(503, f"the {self.name} lane is busy; try again shortly")
+            try:
+                yield
+            finally:
+                self._slots.release()
+        finally:
+            self.pending -= 1
+
+    async def call(self, func, *args):
+        if self.executor is None:
+            return func(*args)
+        executor = self.executor
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            # One dead worker (killed, out of memory) breaks the whole process
+            # pool: replace it, unless a concurrent request already has, and
+            # retry once.
+            sadhak.logger.warning("A %s lane worker died; restarting its pool", self.name)
+            if self.executor is executor:
+                self.executor = _make_executor(self.name)
+                executor.shutdown(wait=False, cancel_futures=True)
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def run(self, func, *args):
+        async with self.slot():
+            return await self.call(func, *args)
+
+    async def iterate(self, func, *args):
+        """Yield the chunks of the generator func(*args); call it inside slot().
+
+        A thread pool lane runs the whole generator on one of its threads, so
+        its thread-local state (metrics timers, the cache's uncacheable flag)
+        stays consistent, and hands each chunk to the loop as it is produced.
+        The fast lane runs it to the end first: its responses take
+        microseconds, and interleaving them with other requests on the loop
+        thread would mix up that same thread-local state.
+        """
+        if self.executor is None:
+            for chunk in list(func(*args)):
+                yield chunk
+            return
+
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue()
+        stop = threading.Event()
+
+        def produce():
+            try:
+                for chunk in func(*args):
+                    loop.call_soon_threadsafe(chunks.put_nowait, ('chunk', chunk))
+                    if stop.is_set():
+                        break
+                loop.call_soon_threadsafe(chunks.put_nowait, ('done', None))
+            except Exception as e:
+                loop.call_soon_threadsafe(chunks.put_nowait, ('error', e))
+
+        future = loop.run_in_executor(self.executor, produce)
+        try:
+            while True:
+                kind, value = await chunks.get()
+                if kind == 'done':
+                    return
+                if kind == 'error':
+                    raise value
+                yield value
+        finally:
+            # Hold the slot until the thread is free again, even if the
+            # client went away mid-stream.
+            stop.set()
+            await future
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+LANES = {
+    'fast': Lane('fast', _env_int('SADHAK_ASYNC_FAST_LIMIT', 256), _env_int('SADHAK_ASYNC_FAST_QUEUE', 1024)),
+    'stats': Lane('stats', _env_int('SADHAK_ASYNC_STATS_LIMIT', os.cpu_count() or 1),
+                  _env_int('SADHAK_ASYNC_STATS_QUEUE', 32)),
+    'expression': Lane('expression', _env_int('SADHAK_ASYNC_EXPRESSION_LIMIT', max(1, sadhak.SYMPY_WORKERS)),
+                       _env_int('SADHAK_ASYNC_EXPRESSION_QUEUE', 16)),
+    'session': Lane('session', _env_int('SADHAK_ASYNC_SESSION_LIMIT', os.cpu_count() or 1),
+                    _env_int('SADHAK_ASYNC_SESSION_QUEUE', 32)),
+    'cached': Lane('cached', _env_int('SADHAK_ASYNC_CACHED_LIMIT', os.cpu_count() or 1),
+                   _env_int('SADHAK_ASYNC_CACHED_QUEUE', 256)),
+}
+
+def _make_executor(name):
+    if name == 'stats':
+        return ProcessPoolExecutor(max_workers=LANES[name].limit, initializer=sadhak.detach_from_server)
+    return ThreadPoolExecutor(max_workers=LANES[name].limit, thread_name_prefix=f'sadhak-{name}')
+
+def _start_executors():
+    for name in ('stats', 'expression', 'session', 'cached'):
+        LANES[name].executor = _make_executor(name)
+
+def _stop_executors():
+    for lane in LANES.values():
+        if lane.executor is not None:
+            lane.executor.shutdown(wait=False, cancel_futures=True)
+            lane.executor = None
+
+def choose_lane(prompt):
+    """Return the lane for a prompt and, when it was computed, its analysis.
+
+    The analysis is handed on to the in-process lanes so the prompt is only
+    scanned once; the stats lane's worker processes scan it themselves rather
+    than receiving a pickled copy of every number.
+    """
+    if len(prompt) > LARGE_PROMPT_CHARS:
+        return LANES['stats'], None
+    analysis = sadhak.analyze_prompt_timed(prompt)
+    if analysis.greeting or analysis.compliment:
+        return LANES['fast'], analysis
+    if analysis.intent == 'expression':
+        return LANES['expression'], analysis
+    if analysis.intent in sadhak.STATISTICS_OPERATIONS and len(analysis.numbers) >= stats_engine.VECTOR_THRESHOLD:
+        return LANES['stats'], None
+    if sadhak.RESULT_CACHE is not None and sadhak.result_cache_key(prompt, analysis) is not None:
+        return LANES['cached'], analysis
+    return LANES['fast'], analysis
+
+
+async def _read_body(receive):
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        body.extend(message.get('body', b''))
+        if len(body) > MAX_BODY_BYTES:
+            raise HTTPError(413, f"request body too large (limit {MAX_BODY_BYTES} bytes)")
+        if not message.get('more_body', False):
+            return bytes(body)
+
+async def _send(send, status, body, content_type, headers=(), head=False):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type.encode()),
+                    (b'content-length', str(len(body)).encode()),
+                    *headers],
+    })
+    # A HEAD response has the GET response's headers and no body.
+    await send({'type': 'http.response.body', 'body': b'' if head else body})
+
+async def _send_json(send, status, payload, headers=()):
+    await _send(send, status, json.dumps(payload).encode(), 'application/json', headers)
+
+def _read_static(filename):
+    with open(os.path.join(ROOT, filename), 'rb') as source:
+        return source.read()
+
+async def _serve_static(send, filename, head=False):
+    try:
+        body = await asyncio.get_running_loop().run_in_executor(None, _read_static, filename)
+    except Exception as e:
+        sadhak.logger.error("Error serving %s: %s", filename, e)
+        await _send(send, 500, f"Error: {str(e)}".encode(), 'text/plain; charset=utf-8', head=head)
+        return
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    if content_type.startswith('text/') or content_type.endswith('javascript'):
+        content_type += '; charset=utf-8'
+    await _send(send, 200, body, content_type, head=head)
+
+async def _read_prompt(receive):
+    """Return (prompt, session_id) from a /generate body, or None on disconnect."""
+    body = await _read_body(receive)
+    if body is None:
+        return None
+    try:
+        payload = json.loads(body)
+        prompt = payload['prompt']
+    except (ValueError, TypeError, KeyError) as e:
+        raise HTTPError(400, f"expected a JSON object with a prompt: {e}")
+    if not isinstance(prompt, str):
+        raise HTTPError(400, f"prompt must be a string, got {type(prompt).__name__}")
+    try:
+        return prompt, sadhak.session_id_from(payload)
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+
+async def _generate(receive, send):
+    started = time.perf_counter()
+    try:
+        request = await _read_prompt(receive)
+        if request is None:
+            return
+        prompt, session_id = request
+        lane, analysis = choose_lane(prompt)
+        if session_id is None:
+            response = await lane.run(sadhak.generate_response, prompt, 20, analysis)
+        else:
+            response = await LANES['session'].run(sadhak.generate_session_response, session_id, prompt, analysis)
+        sadhak.record_first_response(started)
+        await _send_json(send, 200, {'response': response})
+    except HTTPError as e:
+        await _send_json(send, e.status, {'error': str(e)}, [(b'retry-after', b'1')])
+    except Exception as e:
+        sadhak.logger.error("Error in generate route: %s", e)
+        await _send_json(send, 500, {'error': str(e)})
+
+async def _iter_stream(lane, prompt, session_id, analysis):
+    if session_id is not None:
+        chunks = LANES['session'].iterate(sadhak.iter_session_response, session_id, prompt, analysis, True)
+    elif isinstance(lane.executor, ProcessPoolExecutor):
+        # A generator can't cross the process boundary; the stats lane's
+        # responses are sent as one chunk.
+        yield await lane.call(sadhak.generate_response, prompt)
+        return
+    else:
+        chunks = lane.iterate(sadhak.iter_cached_response, prompt, analysis, True)
+    async for chunk in chunks:
+        yield chunk
+
+async def _generate_stream(receive, send):
+    # Server-Sent Events, framed like the Flask route: one {"chunk": ...} event
+    # per section, then a "done" event.
+    started = time.perf_counter()
+    try:
+        request = await _read_prompt(receive)
+        if request is None:
+            return
+        prompt, session_id = request
+        lane, analysis = choose_lane(prompt)
+        if session_id is not None:
+            lane = LANES['session']
+        async with lane.slot():
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [(b'content-type', b'text/event-stream; charset=utf-8'),
+                            (b'cache-control', b'no-cache'),
+                            (b'x-accel-buffering', b'no')],
+            })
+            try:
+                async for chunk in _iter_stream(lane, prompt, session_id, analysis):
+                    await send({'type': 'http.response.body', 'more_body': True,
+                                'body': sadhak.sse_event({'chunk': chunk}).encode()})
+            except Exception as e:
+                await send({'type': 'http.response.body', 'more_body': True,
+                            'body': sadhak.sse_event({'chunk': sadhak.calculation_error_message(e)}).encode()})
+            sadhak.record_first_response(started)
+            await send({'type': 'http.response.body', 'body': sadhak.sse_event({}, event='done').encode()})
+    except HTTPError as e:
+        await _send_json(send, e.status, {'error': str(e)}, [(b'retry-after', b'1')])
+    except Exception as e:
+        sadhak.logger.error("Error in stream route: %s", e)
+        await _send_json(send, 500, {'error': str(e)})
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            _start_executors()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            _stop_executors()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    # Servers that skip the lifespan protocol still get their executors.
+    if LANES['stats'].executor is None:
+        _start_executors()
+
+    path, method = scope['path'], scope['method']
+    if path == '/generate':
+        if method != 'POST':
+            await _send_json(send, 405, {'error': 'method not allowed'}, [(b'allow', b'POST')])
+            return
+        await _generate(receive, send)
+    elif path == '/generate/stream':
+        if method != 'POST':
+            await _send_json(send, 405, {'error': 'method not allowed'}, [(b'allow', b'POST')])
+            return
+        await _generate_stream(receive, send)
+    elif path.startswith('/session/') and method == 'DELETE':
+        deleted = sadhak.SESSIONS.drop(path[len('/session/'):])
+        await _send_json(send, 200, {'deleted': deleted})
+    elif path == '/startup' and method == 'GET':
+        await _send_json(send, 200, sadhak.STARTUP_TIMINGS)
+    elif path == '/metrics' and method == 'GET':
+        await _send(send, 200, metrics.render_prometheus().encode(), 'text/plain; version=0.0.4')
+    elif path in STATIC_FILES and method in ('GET', 'HEAD'):
+        await _serve_static(send, STATIC_FILES[path], head=method == 'HEAD')
+    else:
+        await _send(send, 404, b'Not Found', 'text/plain; charset=utf-8')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve Sadhak Calculator over ASGI")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5001)
+    args = parser.parse_args()
+
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("The async serving mode needs an ASGI server: pip install uvicorn")
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,101 @@
+"""Compare analyze_prompt with the original per-check functions.
+
+Run from the repository root:
+
+    python benchmarks/bench_intent.py
+"""
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import common  # before app: turns the result cache off
+import app
+
+
+# The functions generate_response used before analyze_prompt existed.
+def legacy_extract_numbers(text):
+    return [float(match) for match in re.findall(r'-?\d+(?:\.\d+)?', text)]
+
+def legacy_is_greeting(text):
+    greeting_words = ['hi', 'hello', 'hey', 'greetings', 'good morning', 'good afternoon', 'good evening']
+    return any(word in text.lower() for word in greeting_words)
+
+def legacy_is_compliment(text):
+    compliment_words = ['thanks', 'thank you', 'appreciate', 'grateful', 'good job', 'well done', 'awesome']
+    return any(word in text.lower() for word in compliment_words)
+
+def legacy_interpret_query(prompt):
+    prompt = prompt.lower()
+    if 'median' in prompt:
+        return 'median'
+    elif any(word in prompt for word in ['mode', 'most', 'common', 'frequent']):
+        return 'mode'
+    elif any(word in prompt for word in ['mean', 'average']):
+        return 'mean'
+    elif any(word in prompt for word in ['sum', 'total', 'add']):
+        return 'sum'
+    elif any(word in prompt for word in ['subtract', 'difference']):
+        return 'subtract'
+    elif any(word in prompt for word in ['multiply', 'product']):
+        return 'multiply'
+    elif any(word in prompt for word in ['divide', 'quotient']):
+        return 'divide'
+    elif any(word in prompt for word in ['calculate', 'evaluate', 'simplify', 'expression']):
+        return 'expression'
+    else:
+        return 'unknown'
+
+def legacy_analyze(prompt):
+    return (legacy_is_greeting(prompt), legacy_is_compliment(prompt),
+            legacy_interpret_query(prompt), legacy_extract_numbers(prompt))
+
+
+def random_prompt(rng, words):
+    vocabulary = words + ['the', 'of', 'numbers', 'what', 'is', 'Student', 'please', 'and', ',']
+    parts = []
+    for _ in range(rng.randint(1, 30)):
+        if rng.random() < 0.3:
+            parts.append(str(round(rng.uniform(-1000, 1000), rng.choice([0, 2]))))
+        else:
+            word = rng.choice(vocabulary)
+            parts.append(word.upper() if rng.random() < 0.1 else word)
+    return rng.choice([' ', '']).join(parts)
+
+def check_equivalence(count=20000):
+    rng = random.Random(0)
+    words = list(app.GREETING_WORDS) + list(app.COMPLIMENT_WORDS)
+    for _, keywords in app.INTENT_KEYWORDS:
+        words.extend(keywords)
+    prompts = list(app.TEST_PROMPTS) + [random_prompt(rng, words) for _ in range(count)]
+    for prompt in prompts:
+        expected = legacy_analyze(prompt)
+        if tuple(app.analyze_prompt(prompt)) != expected:
+            raise AssertionError(f"analyze_prompt disagrees with the legacy functions on {prompt!r}")
+    return len(prompts)
+
+def bench(label, prompt, number):
+    legacy = min(timeit.repeat(lambda: legacy_analyze(prompt), number=number, repeat=5)) / number
+    single = min(timeit.repeat(lambda: app.analyze_prompt(prompt), number=number, repeat=5)) / number
+    print(f"{label:<28} {len(prompt):>9} {legacy * 1e6:>12.2f} {single * 1e6:>12.2f} {legacy / single:>8.2f}x")
+
+
+if __name__ == '__main__':
+    checked = check_equivalence()
+    print(f"analyze_prompt matches the legacy functions on {checked} prompts\n")
+
+    short = "Can you find the average of 10, 15, 20, 25, and 30?"
+    no_keywords = "x " * 20000
+    long_stats = "What is the median of " + ", ".join(str(i % 997) for i in range(100000)) + "?"
+    long_prose = ("A teacher recorded the number of books read by students over the summer. " * 2000
+                  + "What is the median?")
+
+    print(f"{'prompt':<28} {'chars':>9} {'legacy (us)':>12} {'analyze (us)':>12} {'speedup':>9}")
+    bench("short", short, 20000)
+    bench("greeting", "Hi there!", 20000)
+    bench("long, no keywords", no_keywords, 200)
+    bench("long prose", long_prose, 200)
+    bench("100k numbers", long_stats, 5)
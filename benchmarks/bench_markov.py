@@ -0,0 +1,117 @@
+"""Compare CompactMarkovModel with the original dict-based SimpleMarkovModel.
+
+Reports training time, retained model memory and generate throughput on a
+synthetic Zipf-distributed corpus. Run from the repository root:
+
+    python benchmarks/bench_markov.py [--tokens 1000000] [--vocab 50000]
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from markov import CompactMarkovModel
+
+
+# The model app.py served before CompactMarkovModel.
+class SimpleMarkovModel:
+    def __init__(self):
+        self.model = {}
+
+    def train(self, text):
+        words = text.lower().split()
+        for i in range(len(words) - 1):
+            if words[i] not in self.model:
+                self.model[words[i]] = {}
+            if words[i + 1] not in self.model[words[i]]:
+                self.model[words[i]][words[i + 1]] = 0
+            self.model[words[i]][words[i + 1]] += 1
+
+    def generate(self, start_word, length=20):
+        if start_word not in self.model:
+            return "I don't know how to respond to that."
+        
+        result = [start_word]
+        for _ in range(length - 1):
+            if result[-1] not in self.model:
+                break
+            next_word_options = list(self.model[result[-1]].keys())
+            next_word_weights = list(self.model[result[-1]].values())
+            next_word = random.choices(next_word_options, weights=next_word_weights)[0]
+            result.append(next_word)
+        
+        return ' '.join(result)
+
+
+def synthetic_corpus(tokens, vocab, seed=0):
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(vocab)]
+    weights = [1 / (rank + 1) for rank in range(vocab)]
+    return ' '.join(rng.choices(words, weights=weights, k=tokens))
+
+def measure_training(factory, train):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    model = factory()
+    train(model)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return model, elapsed, retained
+
+def generate_rate(model, start_words, length):
+    random.seed(1)
+    start = time.perf_counter()
+    produced = 0
+    for word in start_words:
+        produced += len(model.generate(word, length).split())
+    return produced / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tokens', type=int, default=1_000_000)
+    parser.add_argument('--vocab', type=int, default=50_000)
+    parser.add_argument('--generations', type=int, default=2000)
+    parser.add_argument('--length', type=int, default=50)
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(args.tokens, args.vocab)
+    start_words = [f"w{i % 100}" for i in range(args.generations)]
+
+    def train_compact(model):
+        model.train(corpus)
+        model.compile()
+
+    simple, simple_train, simple_memory = measure_training(SimpleMarkovModel, lambda m: m.train(corpus))
+    compact, compact_train, compact_memory = measure_training(CompactMarkovModel, train_compact)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'model.bin')
+        compact.save(path)
+        file_size = os.path.getsize(path)
+        start = time.perf_counter()
+        mapped = CompactMarkovModel.load(path)
+        mapped.generate(start_words[0], 2)
+        load_time = time.perf_counter() - start
+        mapped_rate = generate_rate(mapped, start_words, args.length)
+        del mapped
+
+    simple_rate = generate_rate(simple, start_words, args.length)
+    compact_rate = generate_rate(compact, start_words, args.length)
+
+    print(f"corpus: {args.tokens:,} tokens, {args.vocab:,} word vocabulary\n")
+    print(f"{'model':<22} {'train (s)':>10} {'memory (MB)':>12} {'words/s':>12}")
+    print(f"{'dict (SimpleMarkov)':<22} {simple_train:>10.2f} {simple_memory / 1e6:>12.1f} {simple_rate:>12,.0f}")
+    print(f"{'compact':<22} {compact_train:>10.2f} {compact_memory / 1e6:>12.1f} {compact_rate:>12,.0f}")
+    print(f"{'compact (mmap load)':<22} {load_time:>10.2f} {file_size / 1e6:>12.1f} {mapped_rate:>12,.0f}")
+    print("\nmemory is retained Python heap after training; for the mmap row it is the file size "
+          "and train is the time to load and generate once.")
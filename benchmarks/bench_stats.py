@@ -0,0 +1,77 @@
+"""Compare the statistics engine with the original generate_response branches.
+
+Run from the repository root:
+
+    python benchmarks/bench_stats.py [--sizes 1000 100000 1000000]
+"""
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import common  # before app: turns the result cache off
+import app
+
+
+# The computation and rendering generate_response did before stats_engine;
+# the fixed explanation text is left out since it costs the same either way.
+def legacy_mean(numbers):
+    sum_numbers = sum(numbers)
+    mean = sum_numbers / len(numbers)
+    return f"{' + '.join(map(str, numbers))} = {sum_numbers}\nMean = {mean:.1f}"
+
+def legacy_median(numbers):
+    sorted_nums = sorted(numbers)
+    median = statistics.median(numbers)
+    return f"First, we arrange the numbers in ascending order: {', '.join(map(str, sorted_nums))}\n{median}"
+
+def legacy_mode(numbers):
+    counts = Counter(numbers)
+    max_count = max(counts.values())
+    modes = [k for k, v in counts.items() if v == max_count]
+    response = ''
+    for num, count in counts.items():
+        response += f"{num} appears {count} time{'s' if count > 1 else ''}\n"
+    return response + ', '.join(map(str, modes))
+
+def legacy_sum(numbers):
+    return f"{' + '.join(map(str, numbers))} = {sum(numbers)}"
+
+LEGACY = {'mean': legacy_mean, 'median': legacy_median, 'mode': legacy_mode, 'sum': legacy_sum}
+
+def legacy_generate(prompt):
+    numbers = [float(match) for match in re.findall(r'-?\d+(?:\.\d+)?', prompt)]
+    return LEGACY[app.interpret_query(prompt)](numbers)
+
+def best_of(func, arg, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best, len(result)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10**3, 10**5, 10**6])
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'intent':<8} {'values':>9} {'legacy (ms)':>12} {'engine (ms)':>12} {'speedup':>8} "
+          f"{'legacy chars':>13} {'engine chars':>13}")
+    for size in args.sizes:
+        values = ', '.join(str(round(rng.uniform(0, 1000), 2)) for _ in range(size))
+        repeat = 5 if size <= 10**5 else 2
+        for intent in LEGACY:
+            prompt = f"What is the {intent} of {values}?"
+            legacy, legacy_chars = best_of(legacy_generate, prompt, repeat)
+            engine, engine_chars = best_of(app.generate_response, prompt, repeat)
+            print(f"{intent:<8} {size:>9} {legacy * 1e3:>12.1f} {engine * 1e3:>12.1f} {legacy / engine:>7.1f}x "
+                  f"{legacy_chars:>13,} {engine_chars:>13,}")
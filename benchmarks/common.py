@@ -0,0 +1,9 @@
+"""Environment shared by the benchmark scripts; import it before app.
+
+The scripts measure the computation itself, not result cache hits, so the
+result cache is off unless SADHAK_RESULT_CACHE is already set. Servers the
+scripts spawn inherit the setting.
+"""
+import os
+
+os.environ.setdefault('SADHAK_RESULT_CACHE', 'off')
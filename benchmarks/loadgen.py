@@ -0,0 +1,142 @@
+"""HTTP load generator for the /generate endpoint.
+
+Sends prompts from a fixed set of closed-loop client threads, each over its
+own keep-alive connection, and reports throughput and latency percentiles.
+Run from the repository root:
+
+    python benchmarks/loadgen.py --url http://127.0.0.1:5001/generate --duration 10
+    python benchmarks/loadgen.py --spawn --concurrency 16 --output load.json
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import common  # turns the result cache off, for spawned servers too
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+def _client(url, prompts, offset, deadline, latencies, statuses, lock):
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+    headers = {'Content-Type': 'application/json'}
+    local_latencies, local_statuses = [], {}
+    i = offset
+    while time.perf_counter() < deadline:
+        body = json.dumps({'prompt': prompts[i % len(prompts)]})
+        i += 1
+        start = time.perf_counter()
+        try:
+            connection.request('POST', parts.path or '/', body, headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            status = 'error'
+        local_latencies.append(time.perf_counter() - start)
+        local_statuses[status] = local_statuses.get(status, 0) + 1
+    connection.close()
+    with lock:
+        latencies.extend(local_latencies)
+        for status, count in local_statuses.items():
+            statuses[str(status)] = statuses.get(str(status), 0) + count
+
+def run_load(url, prompts, concurrency=8, duration=10.0):
+    latencies, statuses, lock = [], {}, threading.Lock()
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    threads = [threading.Thread(target=_client, args=(url, prompts, n, deadline, latencies, statuses, lock))
+               for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'url': url,
+        'concurrency': concurrency,
+        'duration_seconds': elapsed,
+        'requests': len(latencies),
+        'statuses': statuses,
+        'throughput_rps': len(latencies) / elapsed if elapsed else 0.0,
+        'latency_seconds': {
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'max': latencies[-1] if latencies else None,
+        },
+    }
+
+def spawn_server(port):
+    # The server runs without the debug reloader, so it is a single process we
+    # can stop cleanly; logging is off so it doesn't skew the measurement.
+    env = dict(os.environ, SADHAK_LOG_LEVEL='OFF')
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'app.py'), '--port', str(port), '--no-debug'],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/startup')
+            connection.getresponse().read()
+            connection.close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"server did not start on port {port}")
+
+def default_prompts():
+    import app
+    return list(app.TEST_PROMPTS)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5001/generate')
+    parser.add_argument('--spawn', action='store_true', help="start a local server for the run")
+    parser.add_argument('--port', type=int, default=5099, help="port for --spawn")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--prompts', help="JSON file with a list of prompts (default: app.TEST_PROMPTS)")
+    parser.add_argument('--output', help="write the report as JSON to this file")
+    args = parser.parse_args()
+
+    if args.prompts:
+        with open(args.prompts) as source:
+            prompts = json.load(source)
+    else:
+        prompts = default_prompts()
+
+    server = None
+    url = args.url
+    if args.spawn:
+        server = spawn_server(args.port)
+        url = f"http://127.0.0.1:{args.port}/generate"
+    try:
+        report = run_load(url, prompts, args.concurrency, args.duration)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as out:
+            json.dump(report, out, indent=2)
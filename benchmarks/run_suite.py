@@ -0,0 +1,212 @@
+"""Reproducible benchmark suite for Sadhak Calculator.
+
+Covers generate_response for every intent in app.TEST_PROMPTS, statistics
+over datasets of 10 to 10^6 numbers, evaluate_expression on increasingly
+nested expressions, value tables over the same sizes, and optionally an HTTP
+load test against /generate. Results are written as JSON, and --compare flags
+regressions against an earlier run. Run from the repository root:
+
+    python benchmarks/run_suite.py --output bench.json
+    python benchmarks/run_suite.py --output new.json --compare bench.json
+    python benchmarks/run_suite.py --quick --load --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('SADHAK_LOG_LEVEL', 'OFF')
+
+import common  # before app: turns the result cache off
+import app
+import loadgen
+
+SCALED_INTENTS = ('mean', 'median', 'mode', 'sum')
+FULL_SIZES = (10, 100, 1000, 10**4, 10**5, 10**6)
+QUICK_SIZES = (10, 100, 1000, 10**4)
+NESTING_DEPTHS = (1, 2, 4, 8, 16)
+
+
+def measure(func, repeat=5, min_round=0.05):
+    # Like timeit's autorange: pick a call count per round that runs for at
+    # least min_round seconds, then report per-call times across rounds.
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_round or number >= 1 << 20:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_round / elapsed) + 1))
+    rounds = [elapsed / number] + [timer.timeit(number) / number for _ in range(repeat - 1)]
+    return {
+        'iterations': number,
+        'rounds': repeat,
+        'min': min(rounds),
+        'median': statistics.median(rounds),
+        'mean': statistics.fmean(rounds),
+    }
+
+def intent_benchmarks(repeat):
+    by_intent = defaultdict(list)
+    for prompt in app.TEST_PROMPTS:
+        analysis = app.analyze_prompt(prompt)
+        intent = 'greeting' if analysis.greeting else 'compliment' if analysis.compliment else analysis.intent
+        by_intent[intent].append(prompt)
+
+    results = []
+    for intent, prompts in sorted(by_intent.items()):
+        def run_all(prompts=prompts):
+            for prompt in prompts:
+                app.generate_response(prompt)
+        timing = measure(run_all, repeat)
+        for key in ('min', 'median', 'mean'):
+            timing[key] /= len(prompts)
+        results.append({'name': f"generate_response/{intent}", 'group': 'intent',
+                        'prompts': len(prompts), 'seconds': timing})
+    return results
+
+def scaled_benchmarks(sizes, repeat):
+    rng = random.Random(0)
+    results = []
+    for size in sizes:
+        values = ', '.join(str(round(rng.uniform(0, 1000), 2)) for _ in range(size))
+        for intent in SCALED_INTENTS:
+            prompt = f"What is the {intent} of {values}?"
+            timing = measure(lambda: app.generate_response(prompt), repeat if size < 10**5 else min(repeat, 3))
+            results.append({'name': f"scaled/{intent}/{size}", 'group': 'scaled', 'size': size, 'seconds': timing})
+    return results
+
+def nested_expression(depth):
+    expression = 'x'
+    for level in range(1, depth + 1):
+        expression = f"({expression}+{level})*(x-{level})/(x+{level})"
+    return expression
+
+def expression_benchmarks(depths, repeat):
+    results = []
+    app.evaluate_expression('x+1')  # start the SymPy workers outside the timing
+    for depth in depths:
+        expression = nested_expression(depth)
+        timing = measure(lambda: app.evaluate_expression(expression), repeat, min_round=0)
+        timed_out = 'timed out' in app.evaluate_expression(expression)
+        results.append({'name': f"expression/nested/{depth}", 'group': 'expression', 'depth': depth,
+                        'timed_out': timed_out, 'seconds': timing})
+    return results
+
+def table_benchmarks(sizes, repeat):
+    # Bound expressions go through the cached, lambdified NumPy path.
+    results = []
+    for size in sizes:
+        prompt = f"Evaluate 2x^2 + 3x - 5 for x from 1 to {size}"
+        timing = measure(lambda: app.generate_response(prompt), repeat)
+        results.append({'name': f"expression/table/{size}", 'group': 'expression', 'size': size, 'seconds': timing})
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(current, baseline, threshold):
+    # A benchmark regresses when its median time (or load p99) grows, or the
+    # load throughput drops, by more than the threshold fraction.
+    previous = {result['name']: result for result in baseline.get('results', [])}
+    regressions = []
+    for result in current['results']:
+        before = previous.get(result['name'])
+        if before is None:
+            continue
+        ratio = result['seconds']['median'] / before['seconds']['median'] if before['seconds']['median'] else 1.0
+        if ratio > 1 + threshold:
+            regressions.append(f"{result['name']}: {ratio:.2f}x slower")
+
+    load, load_before = current.get('load'), baseline.get('load')
+    if load and load_before:
+        if load['throughput_rps'] < load_before['throughput_rps'] * (1 - threshold):
+            regressions.append(f"load throughput: {load_before['throughput_rps']:.1f} -> {load['throughput_rps']:.1f} req/s")
+        p99, p99_before = load['latency_seconds']['p99'], load_before['latency_seconds']['p99']
+        if p99 and p99_before and p99 > p99_before * (1 + threshold):
+            regressions.append(f"load p99: {p99_before * 1e3:.1f} -> {p99 * 1e3:.1f} ms")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--compare', help="baseline JSON from an earlier run")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="fractional slowdown that counts as a regression (default 0.2)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--quick', action='store_true', help="datasets up to 10^4 values only")
+    parser.add_argument('--sizes', type=int, nargs='+', help="dataset sizes for the scaled benchmarks")
+    parser.add_argument('--depths', type=int, nargs='+', default=list(NESTING_DEPTHS))
+    parser.add_argument('--load', action='store_true', help="also run the HTTP load test on a spawned server")
+    parser.add_argument('--load-url', help="run the load test against an already running server")
+    parser.add_argument('--load-duration', type=float, default=10.0)
+    parser.add_argument('--load-concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    random.seed(0)
+    sizes = args.sizes or (QUICK_SIZES if args.quick else FULL_SIZES)
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'sympy_workers': app.SYMPY_WORKERS,
+            'sympy_deadline': app.SYMPY_DEADLINE,
+        },
+        'results': [],
+    }
+
+    for name, run in (('intent', lambda: intent_benchmarks(args.repeat)),
+                      ('scaled', lambda: scaled_benchmarks(sizes, args.repeat)),
+                      ('expression', lambda: expression_benchmarks(args.depths, args.repeat)),
+                      ('table', lambda: table_benchmarks(sizes, args.repeat))):
+        for result in run():
+            report['results'].append(result)
+            print(f"{result['name']:<32} median {result['seconds']['median'] * 1e3:>10.3f} ms")
+
+    if args.load or args.load_url:
+        server = None
+        url = args.load_url
+        if url is None:
+            server = loadgen.spawn_server(5099)
+            url = 'http://127.0.0.1:5099/generate'
+        try:
+            report['load'] = loadgen.run_load(url, list(app.TEST_PROMPTS), args.load_concurrency, args.load_duration)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+        load = report['load']
+        print(f"{'load':<32} {load['throughput_rps']:.1f} req/s, p50 {load['latency_seconds']['p50'] * 1e3:.1f} ms, "
+              f"p95 {load['latency_seconds']['p95'] * 1e3:.1f} ms, p99 {load['latency_seconds']['p99'] * 1e3:.1f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as out:
+            json.dump(report, out, indent=2)
+
+    if args.compare:
+        with open(args.compare) as source:
+            regressions = compare(report, json.load(source), args.threshold)
+        if regressions:
+            print("\nRegressions against", args.compare)
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print("\nNo regressions against", args.compare)
@@ -0,0 +1,196 @@
+"""Compact word-level Markov model.
+
+Words are interned to integer ids and each word's successors live in one
+CSR-style layout: ``offsets[i]:offsets[i + 1]`` slices ``successors`` and
+``cumulative`` (running successor counts), so a generation step is a single
+bisect instead of rebuilding weight lists. A compiled model can be saved to a
+binary file and memory-mapped back, so server workers start without retraining.
+
+Train a model from a corpus with:
+
+    python markov.py corpus.txt [more.txt ...] -o model.bin
+"""
+import argparse
+import mmap
+import random
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+
+_MAGIC = b'SMARKOV1'
+# magic, byte order flag, vocabulary size, edge count, vocabulary blob length
+_HEADER = struct.Struct('<8sBxxxxxxxQQQ')
+
+
+class CompactMarkovModel:
+    def __init__(self):
+        self._vocab = []
+        self._ids = {}
+        self._counts = {}
+        self._offsets = array('Q', [0])
+        self._successors = array('I')
+        self._cumulative = array('Q')
+        self._compiled = True
+        self._mmap = None
+
+    def _id(self, word):
+        ids = self._word_ids()
+        word_id = ids.get(word)
+        if word_id is None:
+            word_id = ids[word] = len(self._vocab)
+            self._vocab.append(word)
+        return word_id
+
+    def _word_ids(self):
+        # Built lazily after load() so a mapped model only pays for the
+        # vocabulary lookup table when a start word is actually looked up.
+        if self._ids is None:
+            self._ids = {word: i for i, word in enumerate(self._vocab)}
+        return self._ids
+
+    def _thaw(self):
+        # Move compiled tables back into per-word counts so training can resume.
+        if not self._compiled:
+            return
+        counts = {}
+        for word_id in range(len(self._offsets) - 1):
+            lo, hi = self._offsets[word_id], self._offsets[word_id + 1]
+            previous = 0
+            successors = counts[word_id] = {}
+            for i in range(lo, hi):
+                successors[self._successors[i]] = self._cumulative[i] - previous
+                previous = self._cumulative[i]
+        self._counts = {word_id: successors for word_id, successors in counts.items() if successors}
+        self._release_mapping()
+        self._compiled = False
+
+    def _train_tokens(self, tokens, previous=None):
+        self._thaw()
+        counts = self._counts
+        for word in tokens:
+            word_id = self._id(word)
+            if previous is not None:
+                successors = counts.get(previous)
+                if successors is None:
+                    successors = counts[previous] = {}
+                successors[word_id] = successors.get(word_id, 0) + 1
+            previous = word_id
+        return previous
+
+    def train(self, text):
+        self._train_tokens(text.lower().split())
+
+    def train_file(self, path, encoding='utf-8'):
+        # Streams the file line by line; the chain carries across line breaks,
+        # so a file trains the same as its whole text passed to train().
+        previous = None
+        with open(path, encoding=encoding) as corpus:
+            for line in corpus:
+                previous = self._train_tokens(line.lower().split(), previous)
+
+    def compile(self):
+        if self._compiled:
+            return
+        offsets = array('Q', [0])
+        successors = array('I')
+        cumulative = array('Q')
+        for word_id in range(len(self._vocab)):
+            running = 0
+            for successor, count in self._counts.get(word_id, {}).items():
+                running += count
+                successors.append(successor)
+                cumulative.append(running)
+            offsets.append(len(successors))
+        self._offsets, self._successors, self._cumulative = offsets, successors, cumulative
+        self._counts = {}
+        self._compiled = True
+
+    def generate(self, start_word, length=20):
+        self.compile()
+        word_id = self._word_ids().get(start_word)
+        offsets, successors, cumulative = self._offsets, self._successors, self._cumulative
+        if word_id is None or offsets[word_id] == offsets[word_id + 1]:
+            return "I don't know how to respond to that."
+
+        result = [word_id]
+        for _ in range(length - 1):
+            lo, hi = offsets[word_id], offsets[word_id + 1]
+            if lo == hi:
+                break
+            pick = random.randrange(cumulative[hi - 1])
+            word_id = successors[bisect_right(cumulative, pick, lo, hi)]
+            result.append(word_id)
+
+        return ' '.join(self._vocab[i] for i in result)
+
+    def save(self, path):
+        self.compile()
+        vocab_blob = '\n'.join(self._vocab).encode('utf-8')
+        byte_order = 0 if sys.byteorder == 'little' else 1
+        with open(path, 'wb') as out:
+            out.write(_HEADER.pack(_MAGIC, byte_order, len(self._vocab), len(self._successors), len(vocab_blob)))
+            out.write(self._offsets.tobytes())
+            out.write(self._cumulative.tobytes())
+            out.write(self._successors.tobytes())
+            if len(self._successors) % 2:
+                out.write(b'\0' * 4)  # keep the vocabulary 8-byte aligned
+            out.write(vocab_blob)
+
+    @classmethod
+    def load(cls, path, use_mmap=True):
+        with open(path, 'rb') as source:
+            if use_mmap:
+                buffer = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                buffer = source.read()
+        view = memoryview(buffer)
+
+        magic, byte_order, vocab_size, edges, vocab_length = _HEADER.unpack_from(view)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a Markov model file")
+        if byte_order != (0 if sys.byteorder == 'little' else 1):
+            raise ValueError(f"{path} was written on a machine with a different byte order")
+
+        position = _HEADER.size
+        def section(size, fmt):
+            nonlocal position
+            part = view[position:position + size]
+            position += size
+            return part.cast(fmt)
+
+        model = cls()
+        model._offsets = section((vocab_size + 1) * 8, 'Q')
+        model._cumulative = section(edges * 8, 'Q')
+        model._successors = section(edges * 4, 'I')
+        position += 4 * (edges % 2)
+        blob = bytes(view[position:position + vocab_length]).decode('utf-8')
+        model._vocab = blob.split('\n') if vocab_size else []
+        model._ids = None
+        model._mmap = buffer if use_mmap else None
+        return model
+
+    def _release_mapping(self):
+        if self._mmap is not None:
+            self._offsets = array('Q', self._offsets)
+            self._cumulative = array('Q', self._cumulative)
+            self._successors = array('I', self._successors)
+            self._mmap = None
+
+    def memory_size(self):
+        # Bytes held by the compiled tables (excluding the vocabulary strings).
+        self.compile()
+        return sum(len(table) * table.itemsize for table in (self._offsets, self._successors, self._cumulative))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train a CompactMarkovModel from text files")
+    parser.add_argument('corpus', nargs='+', help="plain-text training files")
+    parser.add_argument('-o', '--output', required=True, help="where to write the binary model")
+    args = parser.parse_args()
+
+    model = CompactMarkovModel()
+    for path in args.corpus:
+        model.train_file(path)
+    model.save(args.output)
+    print(f"Saved {len(model._vocab)} words and {len(model._successors)} transitions to {args.output}")
@@ -0,0 +1,176 @@
+"""Low-overhead request pipeline metrics, exposed in Prometheus text format.
+
+Stage timings are recorded per intent in fixed-bucket histograms. Metrics are
+per process: batch workers and ASGI stats workers keep their own, and only
+the serving process's metrics are exported. Set SADHAK_METRICS=0 to turn all
+recording into no-ops.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+ENABLED = os.environ.get('SADHAK_METRICS', '1') != '0'
+
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *label_values, amount=1):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, *label_values, value):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *label_values):
+        if not ENABLED:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # per-bucket counts (plus +Inf), then sum
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            items = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        for label_values, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                bucket_label = f'le="{le}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, label_values, bucket_label)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, label_values)} {total}"
+            yield f"{self.name}_count{_format_labels(self.labels, label_values)} {cumulative}"
+
+
+STAGE_SECONDS = Histogram('sadhak_stage_seconds',
+                          'Time spent in each request pipeline stage, by intent.',
+                          ('stage', 'intent'))
+REQUEST_SECONDS = Histogram('sadhak_request_seconds',
+                            'Time to produce a complete response, by intent.',
+                            ('intent',))
+REQUESTS = Counter('sadhak_requests_total', 'Responses generated, by intent.', ('intent',))
+
+# Time spent in nested timers is subtracted from the enclosing section, so a
+# section's "render" time excludes the computation it waited on.
+_local = threading.local()
+
+def _nested_stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+def observe(stage, intent, seconds):
+    STAGE_SECONDS.observe(seconds, stage, intent)
+    stack = _nested_stack()
+    if stack:
+        stack[-1] += seconds
+
+@contextmanager
+def timer(stage, intent):
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, intent, time.perf_counter() - start)
+
+def track_sections(sections, intent):
+    # Times a response generator: the work between yields, minus any nested
+    # timed stages, is recorded as the 'render' stage.
+    if not ENABLED:
+        yield from sections
+        return
+    stack = _nested_stack()
+    render = 0.0
+    started = time.perf_counter()
+    try:
+        while True:
+            stack.append(0.0)
+            step_start = time.perf_counter()
+            try:
+                section = next(sections)
+            except StopIteration:
+                break
+            finally:
+                render += time.perf_counter() - step_start - stack.pop()
+            yield section
+    finally:
+        STAGE_SECONDS.observe(render, 'render', intent)
+        count_request(intent, time.perf_counter() - started)
+
+def count_request(intent, seconds):
+    # For responses that skip track_sections, such as result cache hits.
+    if not ENABLED:
+        return
+    REQUEST_SECONDS.observe(seconds, intent)
+    REQUESTS.inc(intent)
+
+def render_prometheus():
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
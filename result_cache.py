@@ -0,0 +1,127 @@
+"""Shared on-disk cache of rendered responses.
+
+Entries live in one SQLite file in WAL mode, so every worker process on the
+machine (Flask threads, batch workers, ASGI stats workers) reads and fills the
+same cache without a separate server. Entries expire after ``ttl`` seconds and
+the least recently used ones are evicted once the table grows past
+``max_entries``; eviction runs every EVICT_INTERVAL writes, so the bound is
+approximate by a few dozen entries per process.
+
+Methods raise sqlite3.Error as-is; app.py treats any such error (a locked or
+unwritable file, say) as a miss, so the cache never fails a request.
+
+Cached text is served to other users as-is, so the file must not be writable
+by anyone else: the constructor creates the directory with mode 0700 when it
+is missing and raises UnsafeCachePath unless the directory is owned by the
+current user and closed to group and others, and the file, if present, is a
+regular file (not a symlink) owned by the current user.
+"""
+import os
+import sqlite3
+import stat
+import threading
+import time
+
+EVICT_INTERVAL = 64
+# A hit only rewrites its last-used time when that is older than this, so hot
+# entries don't turn every read into a write.
+TOUCH_RESOLUTION = 1.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key BLOB PRIMARY KEY,
+    value TEXT NOT NULL,
+    created REAL NOT NULL,
+    used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_used ON results (used);
+"""
+
+
+class UnsafeCachePath(Exception):
+    pass
+
+
+def default_path():
+    """Return $XDG_CACHE_HOME/sadhak/results.sqlite3 (~/.cache by default)."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'sadhak', 'results.sqlite3')
+
+def check_path(path):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    uid = os.getuid()
+    info = os.stat(directory)
+    if info.st_uid != uid:
+        raise UnsafeCachePath(f"{directory} is not owned by the current user")
+    if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise UnsafeCachePath(f"{directory} is writable by other users")
+    try:
+        info = os.lstat(path)
+    except FileNotFoundError:
+        return
+    if not stat.S_ISREG(info.st_mode):
+        raise UnsafeCachePath(f"{path} is not a regular file")
+    if info.st_uid != uid:
+        raise UnsafeCachePath(f"{path} is not owned by the current user")
+
+
+class ResultCache:
+    def __init__(self, path, max_entries=10000, ttl=86400.0, busy_timeout=0.1):
+        check_path(path)
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork: SQLite handles
+        # must not be shared across threads or inherited by child processes.
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(_SCHEMA)
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def get(self, key):
+        now = time.time()
+        connection = self._connection()
+        row = connection.execute('SELECT value, created, used FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        value, created, used = row
+        if now - created > self.ttl:
+            connection.execute('DELETE FROM results WHERE key = ?', (key,))
+            return None
+        if now - used > TOUCH_RESOLUTION:
+            connection.execute('UPDATE results SET used = ? WHERE key = ?', (now, key))
+        return value
+
+    def put(self, key, value):
+        now = time.time()
+        connection = self._connection()
+        connection.execute('INSERT OR REPLACE INTO results (key, value, created, used) VALUES (?, ?, ?, ?)',
+                           (key, value, now, now))
+        self._writes += 1
+        if self._writes % EVICT_INTERVAL == 0:
+            self.evict(now)
+
+    def evict(self, now=None):
+        now = time.time() if now is None else now
+        connection = self._connection()
+        connection.execute('DELETE FROM results WHERE created < ?', (now - self.ttl,))
+        excess = connection.execute('SELECT COUNT(*) FROM results').fetchone()[0] - self.max_entries
+        if excess > 0:
+            connection.execute('DELETE FROM results WHERE key IN '
+                               '(SELECT key FROM results ORDER BY used LIMIT ?)', (excess,))
+
+    def clear(self):
+        self._connection().execute('DELETE FROM results')
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM results').fetchone()[0]
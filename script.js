@@ -1,3 +1,21 @@
+// Each chat is a server-side session, so follow-up questions can build on the
+// numbers given earlier in the conversation. "New Chat" starts a fresh one.
+function newSessionId() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return Date.now().toString(36) + Math.random().toString(36).slice(2);
+}
+
+let sessionId = newSessionId();
+
+function startNewChat() {
+    fetch('/session/' + encodeURIComponent(sessionId), { method: 'DELETE' }).catch(() => {});
+    sessionId = newSessionId();
+    document.getElementById('chat-messages').innerHTML = '';
+    document.getElementById('query').focus();
+}
+
 function addMessage(content, isUser = false) {
     const messagesDiv = document.getElementById('chat-messages');
     const messageDiv = document.createElement('div');
@@ -6,6 +24,51 @@ function addMessage(content, isUser = false) {
     messageDiv.textContent = content;
     messagesDiv.appendChild(messageDiv);
     messagesDiv.scrollTop = messagesDiv.scrollHeight;
+    return messageDiv;
+}
+
+function appendToMessage(messageDiv, content) {
+    const messagesDiv = document.getElementById('chat-messages');
+    messageDiv.textContent += content;
+    messagesDiv.scrollTop = messagesDiv.scrollHeight;
+}
+
+// Reads the Server-Sent Events stream from /generate/stream and hands each
+// section of the explanation to onChunk as soon as it arrives.
+async function readEventStream(response, onChunk) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            for (const line of frame.split('\n')) {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    data += line.slice(5).trim();
+                }
+            }
+            if (event === 'done') {
+                return;
+            }
+            if (data) {
+                onChunk(JSON.parse(data).chunk);
+            }
+        }
+    }
 }
 
 async function sendQuery() {
@@ -19,27 +82,36 @@ async function sendQuery() {
     addMessage(query, true);
     queryInput.value = '';
 
+    let messageDiv = null;
+
     try {
-        const response = await fetch('/generate', {
+        const response = await fetch('/generate/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({ prompt: query }),
+            body: JSON.stringify({ prompt: query, session_id: sessionId }),
         });
 
         if (!response.ok) {
             throw new Error('Network response was not ok');
         }
 
-        const data = await response.json();
-        addMessage(data.response, false);
+        messageDiv = addMessage('', false);
+        await readEventStream(response, chunk => appendToMessage(messageDiv, chunk));
     } catch (error) {
         console.error('Error:', error);
-        addMessage('Sorry, there was an error processing your request.', false);
+        const errorMessage = 'Sorry, there was an error processing your request.';
+        if (messageDiv) {
+            appendToMessage(messageDiv, '\n\n' + errorMessage);
+        } else {
+            addMessage(errorMessage, false);
+        }
     }
 }
 
+document.getElementById('new-chat').addEventListener('click', startNewChat);
+
 document.getElementById('query').addEventListener('keypress', function(event) {
     if (event.key === 'Enter') {
         sendQuery();
@@ -0,0 +1,179 @@
+"""Per-conversation datasets with incrementally maintained statistics.
+
+A session keeps its values in structures that make small updates cheap:
+
+- Welford/Chan running mean and variance, plus a running fsum total
+- two heaps split at the median, so the median is read in O(1) and each new
+  value costs O(log n)
+- a Counter with the current highest count and the values that reach it, so
+  the mode is updated in O(1) per value
+
+Sessions live in process memory: a deployment with several worker processes
+needs sticky routing for session requests. The store holds at most
+``max_sessions`` sessions (least recently used evicted first), each with at most
+``max_values`` values, and drops sessions idle for longer than ``idle_seconds``.
+"""
+import heapq
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+from itertools import islice
+
+import stats_engine
+
+
+class SessionFull(Exception):
+    pass
+
+
+class RunningStats:
+    def __init__(self, max_values):
+        self.max_values = max_values
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.clear()
+
+    def clear(self):
+        self.count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._total = 0.0
+        self._low = []   # lower half, negated so heapq gives the largest first
+        self._high = []  # upper half
+        self.counts = Counter()
+        self.max_count = 0
+        self._modes = {}
+
+    def __len__(self):
+        return self.count
+
+    def add(self, values):
+        k = len(values)
+        if k == 0:
+            return
+        if self.count + k > self.max_values:
+            raise SessionFull(f"a session holds at most {self.max_values:,} values")
+        self._add_moments(values)
+        if k >= self.count:
+            # A batch at least as large as what's stored is cheaper to place
+            # with one sort than with k heap pushes.
+            self._rebuild_order(values)
+            self.counts.update(values)
+            self.max_count = max(self.counts.values())
+            self._modes = {value: None for value, count in self.counts.items() if count == self.max_count}
+        else:
+            for value in values:
+                self._push(value)
+                self._count_value(value)
+        self.count += k
+
+    def replace(self, values):
+        self.clear()
+        self.add(values)
+
+    def _add_moments(self, values):
+        # Chan's parallel form of Welford's update: combine the batch's own
+        # mean and squared deviations with the running ones in one step.
+        k = len(values)
+        if k >= stats_engine.VECTOR_THRESHOLD:
+            array = stats_engine.as_array(values)
+            batch_mean = float(array.mean())
+            batch_m2 = float(((array - batch_mean) ** 2).sum())
+        else:
+            batch_mean = stats_engine.total(values) / k
+            batch_m2 = stats_engine.total([(value - batch_mean) * (value - batch_mean) for value in values])
+        n = self.count + k
+        delta = batch_mean - self._mean
+        self._mean += delta * k / n
+        self._m2 += batch_m2 + delta * delta * self.count * k / n
+        self._total = math.fsum((self._total, stats_engine.total(values)))
+
+    def _push(self, value):
+        if not self._low or value <= -self._low[0]:
+            heapq.heappush(self._low, -value)
+        else:
+            heapq.heappush(self._high, value)
+        if len(self._low) > len(self._high) + 1:
+            heapq.heappush(self._high, -heapq.heappop(self._low))
+        elif len(self._high) > len(self._low):
+            heapq.heappush(self._low, -heapq.heappop(self._high))
+
+    def _rebuild_order(self, values):
+        # Ascending halves are already valid heaps: the upper half as is, the
+        # lower half reversed and negated.
+        ordered = sorted([-value for value in self._low] + self._high + list(values))
+        half = (len(ordered) + 1) // 2
+        self._low = [-value for value in reversed(ordered[:half])]
+        self._high = ordered[half:]
+
+    def _count_value(self, value):
+        count = self.counts[value] = self.counts[value] + 1
+        if count > self.max_count:
+            self.max_count = count
+            self._modes = {value: None}
+        elif count == self.max_count:
+            self._modes[value] = None
+
+    def total(self):
+        return self._total
+
+    def mean(self):
+        return self._mean
+
+    def variance(self):
+        """Population variance of the stored values."""
+        return self._m2 / self.count if self.count else 0.0
+
+    def median(self):
+        """Return (median, lower_middle, upper_middle), like stats_engine.median."""
+        low = -self._low[0]
+        high = low if self.count % 2 else self._high[0]
+        return (low + high) / 2 if self.count % 2 == 0 else low, low, high
+
+    def mode_preview(self, limit):
+        """Return (max_count, mode_count, modes) with at most ``limit`` modes.
+
+        With all-distinct data every value is a mode, so copying them all
+        would cost O(n) per call.
+        """
+        return self.max_count, len(self._modes), list(islice(self._modes, limit))
+
+
+class SessionStore:
+    def __init__(self, max_sessions=256, max_values=200000, idle_seconds=1800.0):
+        self.max_sessions = max_sessions
+        self.max_values = max_values
+        self.idle_seconds = idle_seconds
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict_idle(self, now):
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_used <= self.idle_seconds:
+                break
+            self._sessions.popitem(last=False)
+
+    def get(self, session_id, create=True):
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                if not create:
+                    return None
+                session = self._sessions[session_id] = RunningStats(self.max_values)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_used = now
+            return session
+
+    def drop(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def __len__(self):
+        return len(self._sessions)
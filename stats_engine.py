@@ -0,0 +1,109 @@
+"""Statistics and step rendering for large datasets.
+
+Small inputs keep to plain Python; once a dataset reaches VECTOR_THRESHOLD
+values the selection-based paths use NumPy, which is imported on first use so
+the common small queries never pay for it.
+"""
+import math
+import os
+from collections import Counter
+from functools import reduce
+from operator import truediv
+
+VECTOR_THRESHOLD = int(os.environ.get('SADHAK_VECTOR_THRESHOLD', 2048))
+
+# Above RENDER_LIMIT values the step-by-step text shows the first and last
+# PREVIEW_SIZE values instead of the whole dataset.
+RENDER_LIMIT = int(os.environ.get('SADHAK_RENDER_LIMIT', 100))
+PREVIEW_SIZE = int(os.environ.get('SADHAK_PREVIEW_SIZE', 10))
+
+_np = None
+
+def load_numpy():
+    global _np
+    if _np is None:
+        import numpy as np
+        _np = np
+    return _np
+
+def as_array(numbers):
+    return load_numpy().asarray(numbers, dtype=load_numpy().float64)
+
+def _as_list(numbers):
+    # NumPy arrays are iterated through a memoryview, which yields plain floats
+    # one at a time instead of materialising a list of Python floats.
+    if hasattr(numbers, 'dtype'):
+        return memoryview(load_numpy().ascontiguousarray(numbers, dtype=load_numpy().float64))
+    return numbers
+
+def total(numbers):
+    # fsum tracks exact partial sums, so large datasets don't drift the way a
+    # naive left-to-right float sum does. It raises where a float sum would
+    # overflow to ±inf or mix inf and -inf into nan; those get the plain sum.
+    values = _as_list(numbers)
+    try:
+        return math.fsum(values)
+    except (OverflowError, ValueError):
+        return sum(values)
+
+def mean(numbers):
+    return total(numbers) / len(numbers)
+
+def product(numbers):
+    return math.prod(_as_list(numbers))
+
+def quotient(numbers):
+    values = _as_list(numbers)
+    return reduce(truediv, values[1:], values[0])
+
+def median(numbers):
+    """Return (median, lower_middle, upper_middle) without fully sorting large inputs."""
+    n = len(numbers)
+    lower, upper = (n - 1) // 2, n // 2
+    if n < VECTOR_THRESHOLD:
+        ordered = sorted(_as_list(numbers))
+        low, high = ordered[lower], ordered[upper]
+    else:
+        # Introselect places both middle elements in O(n).
+        selected = load_numpy().partition(as_array(numbers), [lower, upper])
+        low, high = float(selected[lower]), float(selected[upper])
+    return (low + high) / 2 if n % 2 == 0 else low, low, high
+
+def frequencies(numbers):
+    # Counter hashes each value once, so mode is O(n) with no sorting.
+    return Counter(_as_list(numbers))
+
+def mode(numbers):
+    counts = frequencies(numbers)
+    max_count = max(counts.values())
+    return counts, max_count, [value for value, count in counts.items() if count == max_count]
+
+def format_values(numbers, separator):
+    n = len(numbers)
+    if n <= RENDER_LIMIT:
+        return separator.join(map(str, _as_list(numbers)))
+    head = _as_list(numbers[:PREVIEW_SIZE])
+    tail = _as_list(numbers[n - PREVIEW_SIZE:])
+    return (f"{separator.join(map(str, head))}{separator}…{separator}{separator.join(map(str, tail))}"
+            f" ({n - 2 * PREVIEW_SIZE:,} values omitted)")
+
+def format_sorted(numbers, separator=', '):
+    n = len(numbers)
+    if n <= RENDER_LIMIT:
+        return separator.join(map(str, sorted(_as_list(numbers))))
+    # Only the ends of the sorted order are shown, so only they get sorted.
+    np = load_numpy()
+    values = as_array(numbers)
+    head = np.sort(np.partition(values, PREVIEW_SIZE - 1)[:PREVIEW_SIZE]).tolist()
+    tail = np.sort(np.partition(values, n - PREVIEW_SIZE)[n - PREVIEW_SIZE:]).tolist()
+    return (f"{separator.join(map(str, head))}{separator}…{separator}{separator.join(map(str, tail))}"
+            f" ({n - 2 * PREVIEW_SIZE:,} values omitted)")
+
+def format_counts(counts):
+    lines = []
+    items = counts.items() if len(counts) <= RENDER_LIMIT else counts.most_common(PREVIEW_SIZE)
+    for value, count in items:
+        lines.append(f"{value} appears {count} time{'s' if count > 1 else ''}\n")
+    if len(counts) > RENDER_LIMIT:
+        lines.append(f"… and {len(counts) - PREVIEW_SIZE:,} other distinct values\n")
+    return ''.join(lines)